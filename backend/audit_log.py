@@ -0,0 +1,205 @@
+import json
+import os
+import sqlite3
+import time
+from datetime import datetime, timezone
+from typing import Any
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS audit (
+    id INTEGER PRIMARY KEY,
+    ts REAL NOT NULL,
+    action TEXT NOT NULL,
+    command TEXT,
+    device TEXT,
+    agent_id TEXT,
+    job_id TEXT,
+    status TEXT NOT NULL,
+    error TEXT,
+    detail TEXT
+);
+CREATE INDEX IF NOT EXISTS audit_device ON audit (device, id);
+CREATE INDEX IF NOT EXISTS audit_action ON audit (action, id);
+CREATE INDEX IF NOT EXISTS audit_agent ON audit (agent_id, id);
+CREATE INDEX IF NOT EXISTS audit_ts ON audit (ts);
+"""
+
+_COLUMNS = ("ts", "action", "command", "device", "agent_id", "job_id", "status", "error", "detail")
+_SEGMENT_PREFIX = "audit-"
+_SEGMENT_SUFFIX = ".db"
+
+
+def _segment_day(ts: float) -> str:
+    return datetime.fromtimestamp(ts, timezone.utc).strftime("%Y%m%d")
+
+
+class AuditLog:
+    # Append-only command log: one SQLite segment per UTC day, rows are never
+    # updated, and whole segments are dropped once older than the retention.
+    # Entries are buffered in memory and written in batches by a background loop.
+
+    def __init__(self, directory: str, retention_days: int) -> None:
+        self.directory = directory
+        self.retention_days = retention_days
+        self._pending: list[tuple[Any, ...]] = []
+
+    def record(self, entry: dict[str, Any]) -> None:
+        if not self.directory:
+            return
+
+        detail = entry.get("detail")
+        self._pending.append(
+            (
+                entry.get("ts") or time.time(),
+                entry["action"],
+                entry.get("command"),
+                entry.get("device"),
+                entry.get("agent_id"),
+                entry.get("job_id"),
+                entry["status"],
+                entry.get("error"),
+                json.dumps(detail, default=str) if detail else None,
+            )
+        )
+
+    def drain(self) -> list[tuple[Any, ...]]:
+        pending, self._pending = self._pending, []
+        return pending
+
+    def _connect(self, day: str) -> sqlite3.Connection:
+        conn = sqlite3.connect(
+            os.path.join(self.directory, f"{_SEGMENT_PREFIX}{day}{_SEGMENT_SUFFIX}"),
+            isolation_level=None,
+        )
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA busy_timeout = 5000")
+        conn.execute("PRAGMA journal_mode = WAL")
+        conn.executescript(_SCHEMA)
+        return conn
+
+    def _segments(self) -> list[str]:
+        try:
+            names = os.listdir(self.directory)
+        except FileNotFoundError:
+            return []
+        return sorted(
+            name[len(_SEGMENT_PREFIX) : -len(_SEGMENT_SUFFIX)]
+            for name in names
+            if name.startswith(_SEGMENT_PREFIX) and name.endswith(_SEGMENT_SUFFIX)
+        )
+
+    def write(self, rows: list[tuple[Any, ...]]) -> None:
+        if not self.directory or not rows:
+            return
+
+        os.makedirs(self.directory, exist_ok=True)
+        by_day: dict[str, list[tuple[Any, ...]]] = {}
+        for row in rows:
+            by_day.setdefault(_segment_day(row[0]), []).append(row)
+
+        for day, day_rows in by_day.items():
+            conn = self._connect(day)
+            try:
+                conn.execute("BEGIN IMMEDIATE")
+                conn.executemany(
+                    f"INSERT INTO audit ({', '.join(_COLUMNS)}) VALUES ({', '.join('?' * len(_COLUMNS))})",
+                    day_rows,
+                )
+                conn.execute("COMMIT")
+            finally:
+                conn.close()
+
+        oldest = _segment_day(time.time() - self.retention_days * 86400)
+        for day in self._segments():
+            if day >= oldest:
+                break
+            for suffix in ("", "-wal", "-shm"):
+                try:
+                    os.remove(os.path.join(self.directory, f"{_SEGMENT_PREFIX}{day}{_SEGMENT_SUFFIX}{suffix}"))
+                except FileNotFoundError:
+                    pass
+
+    def flush(self) -> int:
+        rows = self.drain()
+        self.write(rows)
+        return len(rows)
+
+    def query(
+        self,
+        device: str | None,
+        action: str | None,
+        command: str | None,
+        agent_id: str | None,
+        since_ts: float | None,
+        until_ts: float | None,
+        cursor: tuple[str, int] | None,
+        limit: int,
+    ) -> tuple[list[dict[str, Any]], str | None]:
+        # Newest first, walking segments backwards until the page is full.
+        clauses: list[str] = []
+        params: list[Any] = []
+        for column, value in (("device", device), ("action", action), ("command", command), ("agent_id", agent_id)):
+            if value is not None:
+                clauses.append(f"{column} = ?")
+                params.append(value)
+        if since_ts is not None:
+            clauses.append("ts >= ?")
+            params.append(since_ts)
+        if until_ts is not None:
+            clauses.append("ts < ?")
+            params.append(until_ts)
+
+        first_day = _segment_day(since_ts) if since_ts is not None else None
+        last_day = _segment_day(until_ts) if until_ts is not None else None
+        found: list[tuple[str, dict[str, Any]]] = []
+
+        for day in reversed(self._segments()):
+            if cursor is not None and day > cursor[0]:
+                continue
+            if last_day is not None and day > last_day:
+                continue
+            if first_day is not None and day < first_day:
+                break
+
+            segment_clauses = list(clauses)
+            segment_params = list(params)
+            if cursor is not None and day == cursor[0]:
+                segment_clauses.append("id < ?")
+                segment_params.append(cursor[1])
+            where = f"WHERE {' AND '.join(segment_clauses)}" if segment_clauses else ""
+
+            conn = self._connect(day)
+            try:
+                rows = conn.execute(
+                    f"SELECT id, {', '.join(_COLUMNS)} FROM audit {where} ORDER BY id DESC LIMIT ?",
+                    (*segment_params, limit + 1 - len(found)),
+                ).fetchall()
+            finally:
+                conn.close()
+
+            for row in rows:
+                found.append(
+                    (
+                        day,
+                        {
+                            "id": row["id"],
+                            "ts": datetime.fromtimestamp(row["ts"], timezone.utc).isoformat(),
+                            "action": row["action"],
+                            "command": row["command"],
+                            "device": row["device"],
+                            "agent_id": row["agent_id"],
+                            "job_id": row["job_id"],
+                            "status": row["status"],
+                            "error": row["error"],
+                            "detail": json.loads(row["detail"]) if row["detail"] else None,
+                        },
+                    )
+                )
+            if len(found) > limit:
+                break
+
+        next_cursor: str | None = None
+        if len(found) > limit:
+            day, entry = found[limit - 1]
+            next_cursor = f"{day}:{entry['id']}"
+        return [entry for _day, entry in found[:limit]], next_cursor
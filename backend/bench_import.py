@@ -0,0 +1,39 @@
+import os
+import statistics
+import subprocess
+import sys
+
+# Cold-start cost of `import main` per APP_MODE, each run in a fresh interpreter.
+# Usage: python bench_import.py [runs]
+BENCH_RUNS = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+
+_SNIPPET = (
+    "import time; started = time.perf_counter(); import main; "
+    "print((time.perf_counter() - started) * 1000)"
+)
+
+
+def _import_ms(mode: str) -> float:
+    env = {**os.environ, "APP_MODE": mode}
+    completed = subprocess.run(
+        [sys.executable, "-c", _SNIPPET],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return float(completed.stdout.strip().splitlines()[-1])
+
+
+def main() -> None:
+    for mode in ("all", "cloud", "local"):
+        samples = [_import_ms(mode) for _ in range(BENCH_RUNS)]
+        print(
+            f"{mode:>5}: median {statistics.median(samples):7.1f} ms  "
+            f"min {min(samples):7.1f} ms  ({BENCH_RUNS} runs)"
+        )
+
+
+if __name__ == "__main__":
+    main()
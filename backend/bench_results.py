@@ -0,0 +1,110 @@
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+
+# Peak RSS and on-disk size after enqueueing and finishing many jobs with large
+# results, with result spilling (REMOTE_RESULT_DIR) off and on, each run in a
+# fresh interpreter against its own broker database file.
+# Usage: python bench_results.py [jobs] [result_kb]
+BENCH_JOBS = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+RESULT_KB = int(sys.argv[2]) if len(sys.argv) > 2 else 8
+JOBS_PER_POLL = 50
+
+
+def _dir_bytes(path: str) -> int:
+    total = 0
+    for root, _dirs, files in os.walk(path):
+        total += sum(os.path.getsize(os.path.join(root, name)) for name in files)
+    return total
+
+
+def _run(jobs: int, result_kb: int) -> None:
+    # Runs in the child interpreter: the broker reads its configuration at import time.
+    import asyncio
+    import resource
+    import time
+
+    import broker_api
+
+    # Display-list shaped rows, roughly result_kb of JSON.
+    row_count = max(1, result_kb * 1024 // 48)
+    result = {
+        "http_status": 200,
+        "data": {"rows": [{"id": i, "name": f"display-{i}", "state": "ON"} for i in range(row_count)]},
+    }
+
+    async def _jobs() -> None:
+        for start in range(0, jobs, JOBS_PER_POLL):
+            for _ in range(min(JOBS_PER_POLL, jobs - start)):
+                await broker_api.enqueue_remote_job(
+                    broker_api.RemoteEnqueueRequest(agent_id="bench", kind="local_http", payload={"path": "/health"}),
+                    x_api_key=None,
+                )
+            polled = await broker_api.agent_poll_jobs(
+                "bench",
+                broker_api.AgentPollRequest(max_jobs=JOBS_PER_POLL),
+                x_agent_token=None,
+            )
+            for job in polled["jobs"]:
+                await broker_api.agent_submit_result(
+                    "bench",
+                    job["job_id"],
+                    broker_api.AgentJobResultRequest(status="success", result=result),
+                    x_agent_token=None,
+                )
+
+    started = time.perf_counter()
+    asyncio.run(_jobs())
+    elapsed = time.perf_counter() - started
+    # ru_maxrss is in kilobytes on Linux.
+    print(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024, elapsed)
+
+
+def _bench(spill: bool) -> tuple[int, int, int, float]:
+    workdir = tempfile.mkdtemp(prefix="bench_results_")
+    try:
+        db_path = os.path.join(workdir, "broker.db")
+        result_dir = os.path.join(workdir, "results")
+        env = {
+            **os.environ,
+            "APP_MODE": "cloud",
+            "BROKER_DB_PATH": db_path,
+            "REMOTE_RESULT_DIR": result_dir if spill else "",
+            "REMOTE_AUTH_REQUIRED": "false",
+            # Keep every segment so the disk figure covers all results.
+            "REMOTE_RESULT_MAX_SEGMENTS": "100000",
+            "AUDIT_LOG_DIR": "",
+            "STATUS_HISTORY_DIR": "",
+        }
+        completed = subprocess.run(
+            [sys.executable, "-c", f"import bench_results; bench_results._run({BENCH_JOBS}, {RESULT_KB})"],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            env=env,
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        rss_bytes, elapsed = completed.stdout.strip().splitlines()[-1].split()
+        db_bytes = sum(
+            os.path.getsize(path) for path in (db_path, f"{db_path}-wal") if os.path.exists(path)
+        )
+        return int(rss_bytes), db_bytes, _dir_bytes(result_dir), float(elapsed)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def main() -> None:
+    print(f"{BENCH_JOBS} jobs, ~{RESULT_KB} KB result each")
+    for spill in (False, True):
+        rss_bytes, db_bytes, segment_bytes, elapsed = _bench(spill)
+        print(
+            f"spill {'on ' if spill else 'off'}: peak RSS {rss_bytes / 2**20:7.1f} MB  "
+            f"db {db_bytes / 2**20:7.1f} MB  segments {segment_bytes / 2**20:7.1f} MB  "
+            f"({elapsed:.1f} s)"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,706 @@
+import asyncio
+import json
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Any, Iterator
+from uuid import uuid4
+
+from fastapi import APIRouter, Header, HTTPException
+from pydantic import BaseModel, Field
+
+from broker_store import BrokerStore, QueueFullError, agent_wakeup_key, job_wakeup_key
+from common import (
+    AGENT_OFFLINE_AFTER_SECONDS,
+    AGENT_SHARED_SECRET,
+    BROKER_DB_PATH,
+    BROKER_WAKEUP_POLL_SECONDS,
+    LATENCY_RETENTION_SECONDS,
+    LATENCY_WINDOW_SECONDS,
+    REMOTE_AUTH_REQUIRED,
+    REMOTE_BATCH_MAX_TARGETS,
+    REMOTE_JOB_TTL_SECONDS,
+    REMOTE_QUEUE_MAX_PER_AGENT,
+    REMOTE_QUEUE_MAX_TOTAL,
+    REMOTE_QUEUE_RETRY_AFTER_SECONDS,
+    REMOTE_RESULT_DIR,
+    REMOTE_RESULT_INLINE_MAX_BYTES,
+    REMOTE_RESULT_MAX_SEGMENTS,
+    REMOTE_RESULT_SEGMENT_MAX_BYTES,
+    STATUS_HISTORY_MAX_GAP_SECONDS,
+    STATUS_HISTORY_SAMPLE_SECONDS,
+    _assert_cloud_api_key,
+    _audit,
+    _background_loops,
+    _CompactRoute,
+    _parse_utc_datetime_arg,
+    _status_history,
+    _utcnow_iso,
+)
+from latency_sketch import quantiles
+from result_store import ResultSegmentStore
+
+# Cloud side: job queue, agent polling and fleet status. Never touches MDC.
+router = APIRouter(route_class=_CompactRoute)
+
+# Store calls are blocking SQLite work and run in worker threads.
+_broker = BrokerStore(BROKER_DB_PATH)
+# Long-polls wait on one key: agent:<id> for new work, job:<id> for a finished job.
+_broker_waiters: dict[str, set[asyncio.Event]] = {}
+
+_result_store = ResultSegmentStore(
+    REMOTE_RESULT_DIR,
+    segment_max_bytes=REMOTE_RESULT_SEGMENT_MAX_BYTES,
+    max_segments=REMOTE_RESULT_MAX_SEGMENTS,
+)
+
+
+BATCH_TARGET_KINDS = {"tv", "test", "probe", "mdc_execute", "local_http"}
+FINISHED_JOB_STATUSES = {"completed", "failed", "expired"}
+
+
+class RemoteEnqueueRequest(BaseModel):
+    agent_id: str = Field(min_length=1, max_length=128)
+    kind: str = Field(min_length=1, max_length=64)
+    payload: dict[str, Any] = Field(default_factory=dict)
+    # Overrides REMOTE_JOB_TTL_SECONDS: how long the job may wait for an agent.
+    ttl_seconds: float | None = Field(default=None, gt=0, le=86400)
+
+
+class AgentHeartbeatRequest(BaseModel):
+    version: str | None = None
+    hostname: str | None = None
+    local_backend_url: str | None = None
+
+
+class AgentPollRequest(BaseModel):
+    max_jobs: int = Field(default=5, ge=1, le=50)
+    wait_seconds: float = Field(default=0, ge=0, le=30)
+
+
+class AgentJobResultRequest(BaseModel):
+    status: str = Field(min_length=1, max_length=32)
+    result: dict[str, Any] | None = None
+    error: str | None = None
+    # Agent-side spans in milliseconds: agent_wait_ms, execute_ms.
+    timings: dict[str, float] | None = None
+
+
+class DisplayStatusDelta(BaseModel):
+    key: str = Field(min_length=1, max_length=128)
+    online: bool
+    power: str | None = None
+    input: str | None = None
+
+
+class AgentStatusReport(BaseModel):
+    full: bool = False
+    # Agent clock, kept for display only; freshness uses the cloud receive time.
+    observed_at: datetime | None = None
+    deltas: list[DisplayStatusDelta] = Field(default_factory=list, max_length=5000)
+
+
+def _assert_agent_secret(x_agent_token: str | None) -> None:
+    if REMOTE_AUTH_REQUIRED and not AGENT_SHARED_SECRET:
+        raise HTTPException(
+            status_code=503,
+            detail="Remote agent auth is required but AGENT_SHARED_SECRET is not configured.",
+        )
+
+    if AGENT_SHARED_SECRET and x_agent_token != AGENT_SHARED_SECRET:
+        raise HTTPException(status_code=401, detail="Invalid agent token.")
+
+
+def _validate_batch_payload(payload: dict[str, Any]) -> None:
+    target_kind = str(payload.get("kind", "")).strip().lower()
+    if target_kind not in BATCH_TARGET_KINDS:
+        allowed = ", ".join(sorted(BATCH_TARGET_KINDS))
+        raise HTTPException(status_code=400, detail=f"batch payload kind must be one of: {allowed}.")
+
+    params = payload.get("params", {})
+    if not isinstance(params, dict):
+        raise HTTPException(status_code=400, detail="batch payload params must be an object.")
+
+    targets = payload.get("targets")
+    if not isinstance(targets, list) or not targets:
+        raise HTTPException(status_code=400, detail="batch payload requires a non-empty targets list.")
+
+    if len(targets) > REMOTE_BATCH_MAX_TARGETS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"batch payload supports at most {REMOTE_BATCH_MAX_TARGETS} targets.",
+        )
+
+    if not all(isinstance(target, dict) for target in targets):
+        raise HTTPException(status_code=400, detail="batch payload targets must be objects.")
+
+    concurrency = payload.get("concurrency")
+    if concurrency is not None and (
+        isinstance(concurrency, bool) or not isinstance(concurrency, int) or concurrency < 1
+    ):
+        raise HTTPException(status_code=400, detail="batch payload concurrency must be a positive integer.")
+
+
+@contextmanager
+def _broker_waiter(key: str) -> Iterator[asyncio.Event]:
+    # Registered before the first store read, so a change in between is not missed.
+    event = asyncio.Event()
+    _broker_waiters.setdefault(key, set()).add(event)
+    try:
+        yield event
+    finally:
+        waiters = _broker_waiters[key]
+        waiters.discard(event)
+        if not waiters:
+            del _broker_waiters[key]
+
+
+def _notify_broker_waiters(*keys: str) -> None:
+    for key in keys:
+        for event in _broker_waiters.get(key, ()):
+            event.set()
+
+
+async def _wait_for_broker_change(event: asyncio.Event, timeout: float) -> None:
+    try:
+        await asyncio.wait_for(event.wait(), timeout=timeout)
+    except asyncio.TimeoutError:
+        pass
+    event.clear()
+
+
+async def _broker_watch_loop() -> None:
+    # Commits from other workers show up as a new data_version on our connection;
+    # their wakeup rows then name the agents and jobs to wake here.
+    if not _broker.shared:
+        return
+
+    last_version = await asyncio.to_thread(_broker.data_version)
+    last_seq = await asyncio.to_thread(_broker.last_wakeup_seq)
+    while True:
+        await asyncio.sleep(BROKER_WAKEUP_POLL_SECONDS)
+        try:
+            current_version = await asyncio.to_thread(_broker.data_version)
+            if current_version == last_version:
+                continue
+            last_version = current_version
+            last_seq, keys = await asyncio.to_thread(_broker.wakeups_after, last_seq)
+        except Exception as exc:
+            print(f"[broker] wakeup check failed: {exc}")
+            continue
+        _notify_broker_waiters(*keys)
+
+
+_background_loops.append(_broker_watch_loop)
+
+
+@router.get("/api/remote/agents")
+async def list_remote_agents(
+    x_api_key: str | None = Header(default=None),
+) -> dict[str, list[dict[str, Any]]]:
+    _assert_cloud_api_key(x_api_key)
+
+    return {"agents": await asyncio.to_thread(_broker.list_agents)}
+
+
+def _job_device(payload: dict[str, Any]) -> str | None:
+    ip = str(payload.get("ip") or "").strip()
+    if not ip:
+        return None
+    return f"{ip}:{payload.get('port', 1515)}:{payload.get('display_id', 0)}"
+
+
+def _audit_job_outcome(job: dict[str, Any], status: str, error: str | None) -> None:
+    _audit.record(
+        {
+            "action": "remote_job",
+            "command": job["kind"],
+            "device": _job_device(job["payload"]),
+            "agent_id": job["agent_id"],
+            "job_id": job["job_id"],
+            "status": status,
+            "error": error,
+        }
+    )
+
+
+async def _expire_stale_jobs(agent_id: str | None = None) -> None:
+    expired = await asyncio.to_thread(_broker.expire_jobs, time.time(), _utcnow_iso(), agent_id)
+    for job in expired:
+        _audit_job_outcome(job, "expired", "Expired before an agent picked it up.")
+    _notify_broker_waiters(*(job_wakeup_key(job["job_id"]) for job in expired))
+
+
+@router.post("/api/remote/jobs")
+async def enqueue_remote_job(
+    payload: RemoteEnqueueRequest,
+    x_api_key: str | None = Header(default=None),
+) -> dict[str, Any]:
+    _assert_cloud_api_key(x_api_key)
+
+    kind = payload.kind.strip().lower()
+    if kind == "batch":
+        _validate_batch_payload(payload.payload)
+
+    job_id = str(uuid4())
+    created_ts = time.time()
+    created_at = _utcnow_iso()
+    job = {
+        "job_id": job_id,
+        "agent_id": payload.agent_id.strip(),
+        "kind": kind,
+        "payload": payload.payload,
+        "status": "queued",
+        "created_at": created_at,
+        "dispatched_at": None,
+        "finished_at": None,
+        "result": None,
+        "error": None,
+    }
+
+    # An agent that stopped polling would only get this job much later, all at once.
+    last_seen = await asyncio.to_thread(_broker.agent_last_seen, job["agent_id"])
+    if last_seen and AGENT_OFFLINE_AFTER_SECONDS > 0:
+        offline_for = created_ts - _parse_utc_datetime_arg(last_seen).timestamp()
+        if offline_for > AGENT_OFFLINE_AFTER_SECONDS:
+            job["status"] = "failed"
+            job["finished_at"] = created_at
+            job["error"] = f"Agent {job['agent_id']} is offline (last seen {int(offline_for)}s ago)."
+
+    await _expire_stale_jobs(job["agent_id"])
+    ttl_seconds = payload.ttl_seconds or REMOTE_JOB_TTL_SECONDS
+    expires_ts = created_ts + ttl_seconds if ttl_seconds > 0 else None
+    queued = job["status"] == "queued"
+    try:
+        await asyncio.to_thread(
+            _broker.add_job,
+            job,
+            created_ts=created_ts,
+            expires_ts=expires_ts,
+            max_agent_depth=(REMOTE_QUEUE_MAX_PER_AGENT or None) if queued else None,
+            max_total_depth=(REMOTE_QUEUE_MAX_TOTAL or None) if queued else None,
+        )
+    except QueueFullError as exc:
+        scope = f"Agent {job['agent_id']}" if exc.scope == "agent" else "Broker"
+        raise HTTPException(
+            status_code=429,
+            detail=f"{scope} queue is full ({exc.depth} jobs waiting). Retry later.",
+            headers={"Retry-After": str(REMOTE_QUEUE_RETRY_AFTER_SECONDS)},
+        ) from exc
+    if queued:
+        _notify_broker_waiters(agent_wakeup_key(job["agent_id"]))
+    else:
+        _audit_job_outcome(job, job["status"], job["error"])
+
+    return {
+        "status": job["status"],
+        "job_id": job_id,
+        "agent_id": job["agent_id"],
+        "kind": job["kind"],
+        "created_at": created_at,
+        "expires_at": (
+            datetime.fromtimestamp(expires_ts, timezone.utc).isoformat() if queued and expires_ts else None
+        ),
+        "error": job["error"],
+    }
+
+
+async def _load_job_result(job: dict[str, Any]) -> dict[str, Any]:
+    # Spilled results are only read back from their segment when a caller asks for them.
+    result_ref = job.pop("result_ref", None)
+    if result_ref:
+        raw = await asyncio.to_thread(_result_store.read, result_ref)
+        job["result"] = json.loads(raw) if raw is not None else None
+        if raw is None:
+            job["result_evicted"] = True
+    return job
+
+
+@router.get("/api/remote/jobs")
+async def list_remote_jobs(
+    agent_id: str | None = None,
+    kind: str | None = None,
+    status: str | None = None,
+    created_after: str | None = None,
+    created_before: str | None = None,
+    cursor: str | None = None,
+    limit: int = 50,
+    include_result: bool = False,
+    x_api_key: str | None = Header(default=None),
+) -> dict[str, Any]:
+    _assert_cloud_api_key(x_api_key)
+
+    if limit < 1 or limit > 500:
+        raise HTTPException(status_code=400, detail="Invalid limit. Use 1-500.")
+
+    try:
+        after_ts = _parse_utc_datetime_arg(created_after).timestamp() if created_after else None
+        before_ts = _parse_utc_datetime_arg(created_before).timestamp() if created_before else None
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+
+    cursor_seq: int | None = None
+    if cursor:
+        try:
+            cursor_seq = int(cursor)
+        except ValueError as exc:
+            raise HTTPException(status_code=400, detail="Invalid cursor.") from exc
+
+    # Served by the (agent|kind|status, seq) and created_ts indexes, newest first.
+    rows = await asyncio.to_thread(
+        _broker.query_jobs,
+        agent_id.strip() if agent_id else None,
+        kind.strip().lower() if kind else None,
+        status.strip().lower() if status else None,
+        after_ts,
+        before_ts,
+        cursor_seq,
+        limit + 1,
+        include_result,
+    )
+    jobs = [job for _seq, job in rows[:limit]]
+
+    if include_result:
+        jobs = [await _load_job_result(job) for job in jobs]
+    else:
+        for job in jobs:
+            job.pop("result", None)
+            job.pop("result_ref", None)
+
+    next_cursor = str(rows[limit - 1][0]) if len(rows) > limit else None
+    return {"jobs": jobs, "next_cursor": next_cursor}
+
+
+@router.get("/api/remote/jobs/{job_id}")
+async def get_remote_job_status(
+    job_id: str,
+    wait: float = 0,
+    x_api_key: str | None = Header(default=None),
+) -> dict[str, Any]:
+    _assert_cloud_api_key(x_api_key)
+
+    if wait < 0 or wait > 30:
+        raise HTTPException(status_code=400, detail="Invalid wait. Use 0-30 seconds.")
+
+    # With wait > 0 this long-polls until the job finishes or the wait runs out.
+    deadline = time.monotonic() + wait
+    with _broker_waiter(job_wakeup_key(job_id)) as changed:
+        while True:
+            job = await asyncio.to_thread(_broker.get_job, job_id)
+            if job is None:
+                raise HTTPException(status_code=404, detail="Job not found.")
+
+            remaining = deadline - time.monotonic()
+            if job["status"] in FINISHED_JOB_STATUSES or remaining <= 0:
+                return await _load_job_result(job)
+            await _wait_for_broker_change(changed, remaining)
+
+
+@router.post("/api/agent/{agent_id}/heartbeat")
+async def agent_heartbeat(
+    agent_id: str,
+    payload: AgentHeartbeatRequest,
+    x_agent_token: str | None = Header(default=None),
+) -> dict[str, str]:
+    _assert_agent_secret(x_agent_token)
+
+    normalized = agent_id.strip()
+    if not normalized:
+        raise HTTPException(status_code=400, detail="Invalid agent_id.")
+
+    await asyncio.to_thread(
+        _broker.record_heartbeat,
+        normalized,
+        {
+            "last_seen": _utcnow_iso(),
+            "version": payload.version,
+            "hostname": payload.hostname,
+            "local_backend_url": payload.local_backend_url,
+        },
+    )
+
+    return {"status": "ok", "agent_id": normalized}
+
+
+@router.post("/api/agent/{agent_id}/poll")
+async def agent_poll_jobs(
+    agent_id: str,
+    payload: AgentPollRequest,
+    x_agent_token: str | None = Header(default=None),
+) -> dict[str, Any]:
+    _assert_agent_secret(x_agent_token)
+
+    normalized = agent_id.strip()
+    if not normalized:
+        raise HTTPException(status_code=400, detail="Invalid agent_id.")
+
+    # Stale jobs are expired rather than handed to an agent that just came back.
+    await _expire_stale_jobs(normalized)
+
+    # With wait_seconds > 0 this long-polls until a job for this agent is enqueued on any worker.
+    deadline = time.monotonic() + payload.wait_seconds
+    with _broker_waiter(agent_wakeup_key(normalized)) as changed:
+        while True:
+            jobs = await asyncio.to_thread(
+                _broker.dispatch_jobs, normalized, payload.max_jobs, _utcnow_iso(), time.time()
+            )
+            remaining = deadline - time.monotonic()
+            if jobs or remaining <= 0:
+                break
+            await _wait_for_broker_change(changed, remaining)
+
+    await asyncio.to_thread(_broker.touch_agent, normalized, _utcnow_iso())
+
+    return {"agent_id": normalized, "jobs": jobs}
+
+
+@router.post("/api/agent/{agent_id}/jobs/{job_id}/result")
+async def agent_submit_result(
+    agent_id: str,
+    job_id: str,
+    payload: AgentJobResultRequest,
+    x_agent_token: str | None = Header(default=None),
+) -> dict[str, Any]:
+    _assert_agent_secret(x_agent_token)
+
+    normalized = agent_id.strip()
+    if not normalized:
+        raise HTTPException(status_code=400, detail="Invalid agent_id.")
+
+    status = payload.status.strip().lower()
+    if status not in {"success", "error"}:
+        raise HTTPException(status_code=400, detail="status must be success or error.")
+
+    job = await asyncio.to_thread(_broker.get_job, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found.")
+
+    if job.get("agent_id") != normalized:
+        raise HTTPException(status_code=403, detail="Job does not belong to this agent.")
+
+    job_status = "completed" if status == "success" else "failed"
+    result = payload.result
+    result_ref: str | None = None
+    if result is not None and REMOTE_RESULT_DIR:
+        encoded = json.dumps(result).encode("utf-8")
+        if len(encoded) > REMOTE_RESULT_INLINE_MAX_BYTES:
+            result_ref = await asyncio.to_thread(_result_store.append, encoded)
+            result = None
+
+    finished_ts = time.time()
+    timings = await asyncio.to_thread(
+        _broker.finish_job,
+        job_id,
+        job_status,
+        _utcnow_iso(),
+        finished_ts,
+        result,
+        payload.error,
+        payload.timings,
+        int(finished_ts // LATENCY_WINDOW_SECONDS),
+        result_ref,
+    )
+    _audit_job_outcome(job, job_status, payload.error)
+    _notify_broker_waiters(job_wakeup_key(job_id))
+    await asyncio.to_thread(_broker.touch_agent, normalized, _utcnow_iso())
+
+    return {
+        "status": "recorded",
+        "job_id": job_id,
+        "job_status": job_status,
+        "timings": timings,
+    }
+
+
+LATENCY_QUANTILES = (0.5, 0.95, 0.99)
+
+
+def _latency_summary(rows: list[tuple[str, str, int, int]]) -> dict[str, dict[str, Any]]:
+    grouped: dict[str, dict[str, list[tuple[int, int]]]] = {}
+    for group, stage, bucket, count in rows:
+        grouped.setdefault(group, {}).setdefault(stage, []).append((bucket, count))
+
+    summary: dict[str, dict[str, Any]] = {}
+    for group, stages in grouped.items():
+        summary[group] = {}
+        for stage, buckets in sorted(stages.items()):
+            count, values = quantiles(buckets, LATENCY_QUANTILES)
+            summary[group][stage] = {
+                "count": count,
+                **{
+                    f"p{round(q * 100)}": round(value, 1) if value is not None else None
+                    for q, value in values.items()
+                },
+            }
+    return summary
+
+
+@router.get("/api/remote/latency")
+async def get_remote_latency(
+    window_minutes: int = 60,
+    agent_id: str | None = None,
+    kind: str | None = None,
+    x_api_key: str | None = Header(default=None),
+) -> dict[str, Any]:
+    _assert_cloud_api_key(x_api_key)
+
+    max_minutes = LATENCY_RETENTION_SECONDS // 60
+    if window_minutes < 1 or window_minutes > max_minutes:
+        raise HTTPException(status_code=400, detail=f"window_minutes must be between 1 and {max_minutes}.")
+
+    # Whole sketch windows only, so the span can be up to one window longer than asked.
+    since_window = int((time.time() - window_minutes * 60) // LATENCY_WINDOW_SECONDS)
+    agent_filter = agent_id.strip() if agent_id else None
+    kind_filter = kind.strip().lower() if kind else None
+
+    by_agent = await asyncio.to_thread(_broker.latency_buckets, since_window, "agent", agent_filter, kind_filter)
+    by_kind = await asyncio.to_thread(_broker.latency_buckets, since_window, "kind", agent_filter, kind_filter)
+    return {
+        "window_minutes": window_minutes,
+        "since": datetime.fromtimestamp(since_window * LATENCY_WINDOW_SECONDS, timezone.utc).isoformat(),
+        "by_agent": _latency_summary(by_agent),
+        "by_kind": _latency_summary(by_kind),
+    }
+
+
+async def _job_expiry_loop() -> None:
+    # Also expires jobs for agents that never poll again, keeping the global depth honest.
+    while True:
+        try:
+            await _expire_stale_jobs()
+            # Every watcher reads wakeup rows within a poll interval; keep a generous margin.
+            await asyncio.to_thread(_broker.prune_wakeups, time.time() - 60)
+        except Exception as exc:
+            print(f"[broker] job expiry failed: {exc}")
+        await asyncio.sleep(30)
+
+
+_background_loops.append(_job_expiry_loop)
+
+
+async def _latency_prune_loop() -> None:
+    while True:
+        oldest = int((time.time() - LATENCY_RETENTION_SECONDS) // LATENCY_WINDOW_SECONDS)
+        try:
+            await asyncio.to_thread(_broker.prune_latency, oldest)
+        except Exception as exc:
+            print(f"[latency] prune failed: {exc}")
+        await asyncio.sleep(LATENCY_WINDOW_SECONDS)
+
+
+_background_loops.append(_latency_prune_loop)
+
+
+async def _status_cursor() -> str:
+    epoch, version = await asyncio.to_thread(_broker.status_cursor)
+    return f"{epoch}:{version}"
+
+
+async def _parse_status_cursor(since: str | None) -> int | None:
+    if not since:
+        return None
+
+    current_epoch, current_version = await asyncio.to_thread(_broker.status_cursor)
+    epoch, _, raw_version = since.partition(":")
+    if epoch != current_epoch:
+        return None
+
+    try:
+        version = int(raw_version)
+    except ValueError:
+        return None
+
+    return version if 0 <= version <= current_version else None
+
+
+async def _status_history_sample_loop() -> None:
+    # One worker owns the history files; it samples the shared status table so it
+    # does not matter which worker received an agent's report.
+    while True:
+        try:
+            if _status_history.claim_writer():
+                sampled_at = time.time()
+                # A device counts as sampled only while its agent keeps sending status
+                # reports; job polls and heartbeats do not vouch for its displays.
+                for device in await asyncio.to_thread(_broker.list_status):
+                    reported_at = device.get("reported_at")
+                    if not reported_at:
+                        continue
+                    age = sampled_at - _parse_utc_datetime_arg(reported_at).timestamp()
+                    if age > STATUS_HISTORY_MAX_GAP_SECONDS:
+                        continue
+                    _status_history.record(
+                        f"{device['agent_id']}/{device['key']}",
+                        sampled_at,
+                        device["online"],
+                    )
+        except Exception as exc:
+            print(f"[status-history] sampling failed: {exc}")
+
+        await asyncio.sleep(STATUS_HISTORY_SAMPLE_SECONDS)
+
+
+_background_loops.append(_status_history_sample_loop)
+
+
+@router.post("/api/agent/{agent_id}/status")
+async def agent_report_status(
+    agent_id: str,
+    payload: AgentStatusReport,
+    x_agent_token: str | None = Header(default=None),
+) -> dict[str, Any]:
+    _assert_agent_secret(x_agent_token)
+
+    normalized = agent_id.strip()
+    if not normalized:
+        raise HTTPException(status_code=400, detail="Invalid agent_id.")
+
+    received_at = _utcnow_iso()
+    observed_at = received_at
+    if payload.observed_at is not None:
+        observed = payload.observed_at
+        observed_at = (observed if observed.tzinfo else observed.replace(tzinfo=timezone.utc)).isoformat()
+    applied = await asyncio.to_thread(
+        _broker.apply_status_report,
+        normalized,
+        payload.full,
+        [delta.model_dump() for delta in payload.deltas],
+        observed_at,
+        received_at,
+    )
+    if not applied:
+        return {"status": "resync", "agent_id": normalized, "resync": True}
+
+    return {"status": "ok", "agent_id": normalized, "resync": False, "applied": len(payload.deltas)}
+
+
+@router.get("/api/remote/status")
+async def list_remote_status(
+    agent_id: str | None = None,
+    x_api_key: str | None = Header(default=None),
+) -> dict[str, Any]:
+    _assert_cloud_api_key(x_api_key)
+
+    cursor = await _status_cursor()
+    devices = await asyncio.to_thread(_broker.list_status, agent_id.strip() if agent_id else None)
+    return {"cursor": cursor, "devices": devices}
+
+
+@router.get("/api/status/changes")
+async def list_status_changes(
+    since: str | None = None,
+    x_api_key: str | None = Header(default=None),
+) -> dict[str, Any]:
+    _assert_cloud_api_key(x_api_key)
+
+    # Read the cursor first so a change racing with this request is re-sent, not lost.
+    cursor = await _status_cursor()
+    since_version = await _parse_status_cursor(since)
+    # Unknown or foreign cursors (e.g. from another database) get a full snapshot.
+    reset = since_version is None
+    if reset:
+        changes = await asyncio.to_thread(_broker.list_status)
+    else:
+        changes = await asyncio.to_thread(_broker.list_status, None, since_version)
+
+    return {"cursor": cursor, "reset": reset, "changes": changes}
@@ -0,0 +1,604 @@
+import json
+import sqlite3
+import threading
+from contextlib import contextmanager
+from typing import Any, Iterator
+from uuid import uuid4
+
+from latency_sketch import bucket_index
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    job_id TEXT NOT NULL UNIQUE,
+    agent_id TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    status TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    created_at TEXT NOT NULL,
+    created_ts REAL NOT NULL,
+    dispatched_at TEXT,
+    finished_at TEXT,
+    result TEXT,
+    error TEXT,
+    dispatched_ts REAL,
+    finished_ts REAL,
+    timings TEXT,
+    expires_ts REAL,
+    result_ref TEXT
+);
+CREATE INDEX IF NOT EXISTS jobs_agent_status ON jobs (agent_id, status, seq);
+CREATE INDEX IF NOT EXISTS jobs_agent ON jobs (agent_id, seq);
+CREATE INDEX IF NOT EXISTS jobs_kind ON jobs (kind, seq);
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, seq);
+CREATE INDEX IF NOT EXISTS jobs_created ON jobs (created_ts);
+
+CREATE TABLE IF NOT EXISTS agents (
+    agent_id TEXT PRIMARY KEY,
+    last_seen TEXT,
+    version TEXT,
+    hostname TEXT,
+    local_backend_url TEXT,
+    status_synced INTEGER NOT NULL DEFAULT 0,
+    status_reported_at TEXT
+);
+
+CREATE TABLE IF NOT EXISTS device_status (
+    agent_id TEXT NOT NULL,
+    key TEXT NOT NULL,
+    online INTEGER NOT NULL,
+    power TEXT,
+    input TEXT,
+    observed_at TEXT,
+    changed_at TEXT,
+    version INTEGER NOT NULL,
+    removed INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (agent_id, key)
+);
+CREATE INDEX IF NOT EXISTS device_status_version ON device_status (version);
+
+CREATE TABLE IF NOT EXISTS latency_sketch (
+    window INTEGER NOT NULL,
+    agent_id TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    stage TEXT NOT NULL,
+    bucket INTEGER NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (window, agent_id, kind, stage, bucket)
+);
+
+CREATE TABLE IF NOT EXISTS meta (
+    name TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS wakeups (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    key TEXT NOT NULL,
+    source TEXT NOT NULL,
+    created_ts REAL NOT NULL
+);
+"""
+
+# Columns added after the first release; ALTERed into existing database files.
+_JOB_MIGRATIONS = {
+    "dispatched_ts": "REAL",
+    "finished_ts": "REAL",
+    "timings": "TEXT",
+    "expires_ts": "REAL",
+    "result_ref": "TEXT",
+}
+_AGENT_MIGRATIONS = {
+    "status_reported_at": "TEXT",
+}
+_JOB_COLUMNS = (
+    "job_id, agent_id, kind, payload, status, created_at, "
+    "dispatched_at, finished_at, result, error, timings, result_ref"
+)
+# Same columns, but without reading the (possibly large) result payload.
+_JOB_SUMMARY_COLUMNS = _JOB_COLUMNS.replace("result,", "NULL AS result,")
+_STATUS_FIELDS = ("online", "power", "input")
+
+
+def agent_wakeup_key(agent_id: str) -> str:
+    return f"agent:{agent_id}"
+
+
+def job_wakeup_key(job_id: str) -> str:
+    return f"job:{job_id}"
+
+
+def _job_from_row(row: sqlite3.Row) -> dict[str, Any]:
+    return {
+        "job_id": row["job_id"],
+        "agent_id": row["agent_id"],
+        "kind": row["kind"],
+        "payload": json.loads(row["payload"]),
+        "status": row["status"],
+        "created_at": row["created_at"],
+        "dispatched_at": row["dispatched_at"],
+        "finished_at": row["finished_at"],
+        "result": json.loads(row["result"]) if row["result"] is not None else None,
+        "error": row["error"],
+        "timings": json.loads(row["timings"]) if row["timings"] is not None else None,
+        "result_ref": row["result_ref"],
+    }
+
+
+def _status_from_row(row: sqlite3.Row) -> dict[str, Any]:
+    if row["removed"]:
+        return {"agent_id": row["agent_id"], "key": row["key"], "version": row["version"], "removed": True}
+
+    return {
+        "agent_id": row["agent_id"],
+        "key": row["key"],
+        "online": bool(row["online"]),
+        "power": row["power"],
+        "input": row["input"],
+        "observed_at": row["observed_at"],
+        "changed_at": row["changed_at"],
+        "version": row["version"],
+        "agent_last_seen": row["agent_last_seen"],
+        "reported_at": row["status_reported_at"],
+    }
+
+
+def _job_timings(
+    row: sqlite3.Row,
+    finished_ts: float,
+    agent_timings: dict[str, float] | None,
+) -> dict[str, float]:
+    # Cloud-side spans use this host's clock; agent-side spans come from the agent's
+    # monotonic clock, so no cross-host clock comparison is ever made.
+    timings: dict[str, float] = {"total_ms": (finished_ts - row["created_ts"]) * 1000}
+    if row["dispatched_ts"] is None:
+        return {stage: round(value, 3) for stage, value in timings.items()}
+
+    timings["queue_wait_ms"] = (row["dispatched_ts"] - row["created_ts"]) * 1000
+    round_trip_ms = (finished_ts - row["dispatched_ts"]) * 1000
+    agent_ms = 0.0
+    for stage in ("agent_wait_ms", "execute_ms"):
+        value = (agent_timings or {}).get(stage)
+        if isinstance(value, (int, float)) and value >= 0:
+            timings[stage] = float(value)
+            agent_ms += float(value)
+
+    # Whatever the agent did not account for is poll delivery plus result upload.
+    timings["transfer_ms"] = max(round_trip_ms - agent_ms, 0.0)
+    return {stage: round(value, 3) for stage, value in timings.items()}
+
+
+class QueueFullError(Exception):
+    def __init__(self, scope: str, depth: int) -> None:
+        super().__init__(f"{scope} queue is full ({depth} jobs queued)")
+        self.scope = scope
+        self.depth = depth
+
+
+class BrokerStore:
+    # Remote jobs, agent state and the device status feed in one SQLite database.
+    # An empty path keeps everything private to this process; a file path lets
+    # several uvicorn workers share it (WAL mode, short IMMEDIATE transactions).
+    # Callers run methods in worker threads, so the connection is used under a lock.
+
+    def __init__(self, path: str) -> None:
+        self.path = path or ":memory:"
+        self.shared = self.path != ":memory:"
+        # Tags this instance's wakeup rows so its own watcher can skip them.
+        self._source = uuid4().hex
+        self._lock = threading.RLock()
+        self._conn = self._connect()
+        with self._write() as conn:
+            for table, migrations in (("jobs", _JOB_MIGRATIONS), ("agents", _AGENT_MIGRATIONS)):
+                columns = {row["name"] for row in conn.execute(f"PRAGMA table_info({table})")}
+                for column, column_type in migrations.items():
+                    if columns and column not in columns:
+                        conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {column_type}")
+        self._conn.executescript(_SCHEMA)
+        with self._write() as conn:
+            conn.execute("INSERT OR IGNORE INTO meta VALUES ('status_epoch', ?)", (uuid4().hex[:8],))
+            conn.execute("INSERT OR IGNORE INTO meta VALUES ('status_version', '0')")
+        # data_version only moves for commits made by *other* connections.
+        self._watch_conn = self._connect() if self.shared else None
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, isolation_level=None, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA busy_timeout = 5000")
+        if self.shared:
+            conn.execute("PRAGMA journal_mode = WAL")
+            conn.execute("PRAGMA synchronous = NORMAL")
+        return conn
+
+    @contextmanager
+    def _write(self) -> Iterator[sqlite3.Connection]:
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield self._conn
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+
+    def _read(self, query: str, params: Any = ()) -> list[sqlite3.Row]:
+        with self._lock:
+            return self._conn.execute(query, params).fetchall()
+
+    # Cross-worker wakeups. Only the watching worker's connection reads these.
+
+    def data_version(self) -> int:
+        if self._watch_conn is None:
+            return 0
+        return int(self._watch_conn.execute("PRAGMA data_version").fetchone()[0])
+
+    def _add_wakeups(self, conn: sqlite3.Connection, keys: list[str], created_ts: float) -> None:
+        # Written in the same transaction as the change, so a woken worker always sees it.
+        if self.shared and keys:
+            conn.executemany(
+                "INSERT INTO wakeups (key, source, created_ts) VALUES (?, ?, ?)",
+                [(key, self._source, created_ts) for key in keys],
+            )
+
+    def last_wakeup_seq(self) -> int:
+        if self._watch_conn is None:
+            return 0
+        return int(self._watch_conn.execute("SELECT COALESCE(MAX(seq), 0) FROM wakeups").fetchone()[0])
+
+    def wakeups_after(self, after_seq: int) -> tuple[int, set[str]]:
+        if self._watch_conn is None:
+            return after_seq, set()
+        rows = self._watch_conn.execute(
+            "SELECT seq, key, source FROM wakeups WHERE seq > ? ORDER BY seq", (after_seq,)
+        ).fetchall()
+        if not rows:
+            return after_seq, set()
+        return rows[-1]["seq"], {row["key"] for row in rows if row["source"] != self._source}
+
+    def prune_wakeups(self, before_ts: float) -> None:
+        if self.shared:
+            with self._write() as conn:
+                conn.execute("DELETE FROM wakeups WHERE created_ts < ?", (before_ts,))
+
+    # Jobs
+
+    def add_job(
+        self,
+        job: dict[str, Any],
+        created_ts: float,
+        expires_ts: float | None = None,
+        max_agent_depth: int | None = None,
+        max_total_depth: int | None = None,
+    ) -> None:
+        # Depth checks and the insert share one transaction, so the limits hold across workers.
+        with self._write() as conn:
+            if max_agent_depth is not None:
+                depth = conn.execute(
+                    "SELECT COUNT(*) FROM jobs WHERE agent_id = ? AND status = 'queued'",
+                    (job["agent_id"],),
+                ).fetchone()[0]
+                if depth >= max_agent_depth:
+                    raise QueueFullError("agent", depth)
+
+            if max_total_depth is not None:
+                depth = conn.execute("SELECT COUNT(*) FROM jobs WHERE status = 'queued'").fetchone()[0]
+                if depth >= max_total_depth:
+                    raise QueueFullError("global", depth)
+
+            conn.execute(
+                "INSERT INTO jobs (job_id, agent_id, kind, status, payload, created_at, created_ts, "
+                "finished_at, finished_ts, error, expires_ts) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    job["job_id"],
+                    job["agent_id"],
+                    job["kind"],
+                    job["status"],
+                    json.dumps(job["payload"]),
+                    job["created_at"],
+                    created_ts,
+                    job["finished_at"],
+                    created_ts if job["finished_at"] else None,
+                    job["error"],
+                    expires_ts,
+                ),
+            )
+            if job["status"] == "queued":
+                self._add_wakeups(conn, [agent_wakeup_key(job["agent_id"])], created_ts)
+
+    def expire_jobs(self, now_ts: float, finished_at: str, agent_id: str | None = None) -> list[dict[str, Any]]:
+        where = "status = 'queued' AND expires_ts < ?"
+        params: list[Any] = [now_ts]
+        if agent_id is not None:
+            where += " AND agent_id = ?"
+            params.append(agent_id)
+
+        with self._write() as conn:
+            rows = conn.execute(f"SELECT seq, job_id, agent_id, kind, payload FROM jobs WHERE {where}", params).fetchall()
+            conn.executemany(
+                "UPDATE jobs SET status = 'expired', finished_at = ?, finished_ts = ?, "
+                "error = 'Expired before an agent picked it up.' WHERE seq = ?",
+                [(finished_at, now_ts, row["seq"]) for row in rows],
+            )
+            self._add_wakeups(conn, [job_wakeup_key(row["job_id"]) for row in rows], now_ts)
+        return [
+            {
+                "job_id": row["job_id"],
+                "agent_id": row["agent_id"],
+                "kind": row["kind"],
+                "payload": json.loads(row["payload"]),
+            }
+            for row in rows
+        ]
+
+    def get_job(self, job_id: str) -> dict[str, Any] | None:
+        rows = self._read(f"SELECT {_JOB_COLUMNS} FROM jobs WHERE job_id = ?", (job_id,))
+        return _job_from_row(rows[0]) if rows else None
+
+    def dispatch_jobs(
+        self,
+        agent_id: str,
+        max_jobs: int,
+        dispatched_at: str,
+        dispatched_ts: float,
+    ) -> list[dict[str, Any]]:
+        with self._write() as conn:
+            rows = conn.execute(
+                "SELECT seq, job_id, kind, payload FROM jobs "
+                "WHERE agent_id = ? AND status = 'queued' ORDER BY seq LIMIT ?",
+                (agent_id, max_jobs),
+            ).fetchall()
+            conn.executemany(
+                "UPDATE jobs SET status = 'dispatched', dispatched_at = ?, dispatched_ts = ? WHERE seq = ?",
+                [(dispatched_at, dispatched_ts, row["seq"]) for row in rows],
+            )
+        return [
+            {"job_id": row["job_id"], "kind": row["kind"], "payload": json.loads(row["payload"])}
+            for row in rows
+        ]
+
+    def finish_job(
+        self,
+        job_id: str,
+        status: str,
+        finished_at: str,
+        finished_ts: float,
+        result: dict[str, Any] | None,
+        error: str | None,
+        agent_timings: dict[str, float] | None,
+        window: int,
+        result_ref: str | None = None,
+    ) -> dict[str, float]:
+        with self._write() as conn:
+            row = conn.execute(
+                "SELECT agent_id, kind, created_ts, dispatched_ts FROM jobs WHERE job_id = ?",
+                (job_id,),
+            ).fetchone()
+            timings = _job_timings(row, finished_ts, agent_timings) if row is not None else {}
+            conn.execute(
+                "UPDATE jobs SET status = ?, finished_at = ?, finished_ts = ?, result = ?, error = ?, "
+                "timings = ?, result_ref = ? WHERE job_id = ?",
+                (
+                    status,
+                    finished_at,
+                    finished_ts,
+                    json.dumps(result) if result is not None else None,
+                    error,
+                    json.dumps(timings),
+                    result_ref,
+                    job_id,
+                ),
+            )
+            if row is not None:
+                conn.executemany(
+                    "INSERT INTO latency_sketch (window, agent_id, kind, stage, bucket, count) "
+                    "VALUES (?, ?, ?, ?, ?, 1) "
+                    "ON CONFLICT (window, agent_id, kind, stage, bucket) DO UPDATE SET count = count + 1",
+                    [
+                        (window, row["agent_id"], row["kind"], stage, bucket_index(value))
+                        for stage, value in timings.items()
+                    ],
+                )
+            self._add_wakeups(conn, [job_wakeup_key(job_id)], finished_ts)
+        return timings
+
+    def latency_buckets(
+        self,
+        since_window: int,
+        group_by: str,
+        agent_id: str | None = None,
+        kind: str | None = None,
+    ) -> list[tuple[str, str, int, int]]:
+        clauses = ["window >= ?"]
+        params: list[Any] = [since_window]
+        if agent_id is not None:
+            clauses.append("agent_id = ?")
+            params.append(agent_id)
+        if kind is not None:
+            clauses.append("kind = ?")
+            params.append(kind)
+
+        group_column = "agent_id" if group_by == "agent" else "kind"
+        rows = self._read(
+            f"SELECT {group_column}, stage, bucket, SUM(count) FROM latency_sketch "
+            f"WHERE {' AND '.join(clauses)} GROUP BY {group_column}, stage, bucket",
+            params,
+        )
+        return [(row[0], row[1], row[2], row[3]) for row in rows]
+
+    def prune_latency(self, before_window: int) -> None:
+        with self._write() as conn:
+            conn.execute("DELETE FROM latency_sketch WHERE window < ?", (before_window,))
+
+    def query_jobs(
+        self,
+        agent_id: str | None,
+        kind: str | None,
+        status: str | None,
+        after_ts: float | None,
+        before_ts: float | None,
+        before_seq: int | None,
+        limit: int,
+        include_result: bool = True,
+    ) -> list[tuple[int, dict[str, Any]]]:
+        clauses: list[str] = []
+        params: list[Any] = []
+        for column, value in (("agent_id", agent_id), ("kind", kind), ("status", status)):
+            if value is not None:
+                clauses.append(f"{column} = ?")
+                params.append(value)
+        if after_ts is not None:
+            clauses.append("created_ts >= ?")
+            params.append(after_ts)
+        if before_ts is not None:
+            clauses.append("created_ts < ?")
+            params.append(before_ts)
+        if before_seq is not None:
+            clauses.append("seq < ?")
+            params.append(before_seq)
+
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        rows = self._read(
+            f"SELECT seq, {_JOB_COLUMNS if include_result else _JOB_SUMMARY_COLUMNS} "
+            f"FROM jobs {where} ORDER BY seq DESC LIMIT ?",
+            (*params, limit),
+        )
+        return [(row["seq"], _job_from_row(row)) for row in rows]
+
+    # Agents
+
+    def agent_last_seen(self, agent_id: str) -> str | None:
+        rows = self._read("SELECT last_seen FROM agents WHERE agent_id = ?", (agent_id,))
+        return rows[0]["last_seen"] if rows else None
+
+    def touch_agent(self, agent_id: str, last_seen: str) -> None:
+        with self._write() as conn:
+            conn.execute(
+                "INSERT INTO agents (agent_id, last_seen) VALUES (?, ?) "
+                "ON CONFLICT (agent_id) DO UPDATE SET last_seen = excluded.last_seen",
+                (agent_id, last_seen),
+            )
+
+    def record_heartbeat(self, agent_id: str, info: dict[str, Any]) -> None:
+        with self._write() as conn:
+            conn.execute(
+                "INSERT INTO agents (agent_id, last_seen, version, hostname, local_backend_url) "
+                "VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT (agent_id) DO UPDATE SET last_seen = excluded.last_seen, "
+                "version = excluded.version, hostname = excluded.hostname, "
+                "local_backend_url = excluded.local_backend_url",
+                (
+                    agent_id,
+                    info.get("last_seen"),
+                    info.get("version"),
+                    info.get("hostname"),
+                    info.get("local_backend_url"),
+                ),
+            )
+
+    def list_agents(self) -> list[dict[str, Any]]:
+        depths = dict(
+            self._read("SELECT agent_id, COUNT(*) FROM jobs WHERE status = 'queued' GROUP BY agent_id")
+        )
+        rows = self._read(
+            "SELECT agent_id, last_seen, version, hostname, local_backend_url FROM agents ORDER BY agent_id"
+        )
+        return [
+            {
+                "agent_id": row["agent_id"],
+                "last_seen": row["last_seen"],
+                "version": row["version"],
+                "hostname": row["hostname"],
+                "local_backend_url": row["local_backend_url"],
+                "queue_depth": depths.get(row["agent_id"], 0),
+            }
+            for row in rows
+        ]
+
+    # Device status feed
+
+    def _bump_status_version(self, conn: sqlite3.Connection) -> int:
+        conn.execute(
+            "UPDATE meta SET value = CAST(value AS INTEGER) + 1 WHERE name = 'status_version'"
+        )
+        return int(conn.execute("SELECT value FROM meta WHERE name = 'status_version'").fetchone()[0])
+
+    def apply_status_report(
+        self,
+        agent_id: str,
+        full: bool,
+        deltas: list[dict[str, Any]],
+        observed_at: str,
+        received_at: str,
+    ) -> bool:
+        with self._write() as conn:
+            synced = conn.execute(
+                "SELECT status_synced FROM agents WHERE agent_id = ?", (agent_id,)
+            ).fetchone()
+            conn.execute(
+                "INSERT INTO agents (agent_id, last_seen) VALUES (?, ?) "
+                "ON CONFLICT (agent_id) DO UPDATE SET last_seen = excluded.last_seen",
+                (agent_id, received_at),
+            )
+            # Deltas only make sense on top of a snapshot; ask for one first.
+            if not full and (synced is None or not synced["status_synced"]):
+                return False
+
+            existing = {
+                row["key"]: row
+                for row in conn.execute(
+                    "SELECT key, online, power, input, changed_at, removed FROM device_status "
+                    "WHERE agent_id = ?",
+                    (agent_id,),
+                )
+            }
+            for delta in deltas:
+                row = existing.get(delta["key"])
+                state = (int(delta["online"]), delta.get("power"), delta.get("input"))
+                if row is not None and not row["removed"] and tuple(row[field] for field in _STATUS_FIELDS) == state:
+                    conn.execute(
+                        "UPDATE device_status SET observed_at = ? WHERE agent_id = ? AND key = ?",
+                        (observed_at, agent_id, delta["key"]),
+                    )
+                    continue
+
+                conn.execute(
+                    "INSERT OR REPLACE INTO device_status "
+                    "(agent_id, key, online, power, input, observed_at, changed_at, version, removed) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, 0)",
+                    (agent_id, delta["key"], *state, observed_at, observed_at, self._bump_status_version(conn)),
+                )
+
+            # The agent checks every display each cycle but only sends the changed ones,
+            # so any accepted report (even an empty one) vouches for all of its rows.
+            conn.execute(
+                "UPDATE agents SET status_reported_at = ? WHERE agent_id = ?", (received_at, agent_id)
+            )
+
+            if full:
+                reported = {delta["key"] for delta in deltas}
+                for key, row in existing.items():
+                    if key not in reported and not row["removed"]:
+                        conn.execute(
+                            "UPDATE device_status SET removed = 1, version = ? WHERE agent_id = ? AND key = ?",
+                            (self._bump_status_version(conn), agent_id, key),
+                        )
+                conn.execute("UPDATE agents SET status_synced = 1 WHERE agent_id = ?", (agent_id,))
+
+        return True
+
+    def status_cursor(self) -> tuple[str, int]:
+        rows = dict(self._read("SELECT name, value FROM meta WHERE name IN ('status_epoch', 'status_version')"))
+        return rows["status_epoch"], int(rows["status_version"])
+
+    def list_status(self, agent_id: str | None = None, since_version: int | None = None) -> list[dict[str, Any]]:
+        query = (
+            "SELECT d.*, a.last_seen AS agent_last_seen, a.status_reported_at FROM device_status d "
+            "LEFT JOIN agents a ON a.agent_id = d.agent_id "
+        )
+        if since_version is not None:
+            rows = self._read(query + "WHERE d.version > ? ORDER BY d.version", (since_version,))
+        elif agent_id is not None:
+            rows = self._read(query + "WHERE d.removed = 0 AND d.agent_id = ? ORDER BY d.key", (agent_id,))
+        else:
+            rows = self._read(query + "WHERE d.removed = 0 ORDER BY d.agent_id, d.key")
+        return [_status_from_row(row) for row in rows]
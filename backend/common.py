@@ -0,0 +1,236 @@
+import gzip
+import json
+import os
+from datetime import datetime, timezone
+from typing import Any, Awaitable, Callable
+
+import msgpack
+from fastapi import HTTPException, Request, Response
+from fastapi.responses import JSONResponse
+from fastapi.routing import APIRoute
+
+from audit_log import AuditLog
+from status_history import StatusHistoryStore
+
+try:
+    import brotli
+except ImportError:  # brotli is optional; gzip is always available.
+    brotli = None
+
+
+# Hooks run before the app serves requests, long-running loops started with it,
+# and hooks run when it stops.
+_startup_hooks: list[Callable[[], Awaitable[None]]] = []
+_background_loops: list[Callable[[], Awaitable[None]]] = []
+_shutdown_hooks: list[Callable[[], Awaitable[None]]] = []
+
+
+def _env_flag(name: str, default: str) -> bool:
+    return os.getenv(name, default).strip().lower() in {"1", "true", "yes", "on"}
+
+
+# all = every route; cloud = broker routes only, without loading samsung_mdc;
+# local = MDC/local-control routes only (a Pi next to the displays).
+APP_MODE = os.getenv("APP_MODE", "all").strip().lower()
+CONNECTION_TEST_TIMEOUT_SECONDS = float(os.getenv("CONNECTION_TEST_TIMEOUT_SECONDS", "8"))
+PROBE_DEFAULT_TIMEOUT_SECONDS = 1.5
+# Addressed to every display on a daisy chain; displays do not reply to it.
+MDC_BROADCAST_DISPLAY_ID = 0xFE
+ADAPTIVE_TIMEOUT_MIN_SECONDS = float(os.getenv("ADAPTIVE_TIMEOUT_MIN_SECONDS", "1"))
+ADAPTIVE_TIMEOUT_MAX_SECONDS = float(
+    os.getenv("ADAPTIVE_TIMEOUT_MAX_SECONDS", str(CONNECTION_TEST_TIMEOUT_SECONDS))
+)
+MDC_GET_RETRY_ENABLED = _env_flag("MDC_GET_RETRY_ENABLED", "false")
+# deep = MDC status every time, fast = TCP connect only, auto = TCP connect with a
+# deep check when the state flips or the last one is older than the interval.
+HEALTH_CHECK_TIER = os.getenv("HEALTH_CHECK_TIER", "deep").strip().lower()
+HEALTH_DEEP_INTERVAL_SECONDS = float(os.getenv("HEALTH_DEEP_INTERVAL_SECONDS", "300"))
+BROKER_DB_PATH = os.getenv("BROKER_DB_PATH", "").strip()
+BROKER_WAKEUP_POLL_SECONDS = float(os.getenv("BROKER_WAKEUP_POLL_SECONDS", "0.05"))
+STATUS_HISTORY_DIR = os.getenv("STATUS_HISTORY_DIR", "status_history").strip()
+STATUS_HISTORY_FLUSH_SECONDS = float(os.getenv("STATUS_HISTORY_FLUSH_SECONDS", "60"))
+STATUS_HISTORY_SAMPLE_SECONDS = float(os.getenv("STATUS_HISTORY_SAMPLE_SECONDS", "30"))
+STATUS_HISTORY_MAX_GAP_SECONDS = float(os.getenv("STATUS_HISTORY_MAX_GAP_SECONDS", "300"))
+LATENCY_WINDOW_SECONDS = int(os.getenv("LATENCY_WINDOW_SECONDS", "300"))
+LATENCY_RETENTION_SECONDS = int(os.getenv("LATENCY_RETENTION_SECONDS", "86400"))
+# Job results larger than this are compressed into REMOTE_RESULT_DIR segments
+# instead of being stored in the broker row (empty dir keeps everything inline).
+REMOTE_RESULT_INLINE_MAX_BYTES = int(os.getenv("REMOTE_RESULT_INLINE_MAX_BYTES", "4096"))
+REMOTE_RESULT_DIR = os.getenv("REMOTE_RESULT_DIR", "job_results").strip()
+REMOTE_RESULT_SEGMENT_MAX_BYTES = int(os.getenv("REMOTE_RESULT_SEGMENT_MAX_BYTES", str(64 * 1024 * 1024)))
+REMOTE_RESULT_MAX_SEGMENTS = int(os.getenv("REMOTE_RESULT_MAX_SEGMENTS", "16"))
+AUDIT_LOG_DIR = os.getenv("AUDIT_LOG_DIR", "audit_log").strip()
+AUDIT_FLUSH_SECONDS = float(os.getenv("AUDIT_FLUSH_SECONDS", "2"))
+AUDIT_RETENTION_DAYS = int(os.getenv("AUDIT_RETENTION_DAYS", "90"))
+COMPRESSION_MIN_BYTES = int(os.getenv("COMPRESSION_MIN_BYTES", "512"))
+REMOTE_BATCH_MAX_TARGETS = int(os.getenv("REMOTE_BATCH_MAX_TARGETS", "500"))
+# 0 disables a limit.
+REMOTE_QUEUE_MAX_PER_AGENT = int(os.getenv("REMOTE_QUEUE_MAX_PER_AGENT", "200"))
+REMOTE_QUEUE_MAX_TOTAL = int(os.getenv("REMOTE_QUEUE_MAX_TOTAL", "5000"))
+REMOTE_QUEUE_RETRY_AFTER_SECONDS = int(os.getenv("REMOTE_QUEUE_RETRY_AFTER_SECONDS", "5"))
+REMOTE_JOB_TTL_SECONDS = float(os.getenv("REMOTE_JOB_TTL_SECONDS", "900"))
+AGENT_OFFLINE_AFTER_SECONDS = float(os.getenv("AGENT_OFFLINE_AFTER_SECONDS", "120"))
+AGENT_SHARED_SECRET = os.getenv("AGENT_SHARED_SECRET", "").strip()
+CLOUD_API_KEY = os.getenv("CLOUD_API_KEY", "").strip()
+REMOTE_AUTH_REQUIRED = _env_flag("REMOTE_AUTH_REQUIRED", "true")
+
+
+_audit = AuditLog(AUDIT_LOG_DIR, retention_days=AUDIT_RETENTION_DAYS)
+
+_status_history = StatusHistoryStore(
+    STATUS_HISTORY_DIR,
+    max_gap=STATUS_HISTORY_MAX_GAP_SECONDS,
+)
+
+
+MSGPACK_MEDIA_TYPE = "application/msgpack"
+
+
+class _CompactRequest(Request):
+    # Accepts gzip/br request bodies and MessagePack payloads, handing FastAPI plain JSON.
+    def __init__(self, scope: dict[str, Any], receive: Any) -> None:
+        headers = dict(scope.get("headers") or [])
+        self._body_encoding = headers.get(b"content-encoding", b"").decode("latin-1").strip().lower()
+        content_type = headers.get(b"content-type", b"").decode("latin-1").lower()
+        self._body_is_msgpack = content_type.startswith(MSGPACK_MEDIA_TYPE)
+
+        if self._body_encoding or self._body_is_msgpack:
+            rewritten = [
+                (key, value)
+                for key, value in scope.get("headers") or []
+                if key not in {b"content-encoding", b"content-type"}
+            ]
+            rewritten.append((b"content-type", b"application/json"))
+            scope = {**scope, "headers": rewritten}
+
+        super().__init__(scope, receive)
+
+    async def body(self) -> bytes:
+        if not hasattr(self, "_decoded_body"):
+            raw = await super().body()
+            try:
+                if self._body_encoding == "gzip":
+                    raw = gzip.decompress(raw)
+                elif self._body_encoding == "br" and brotli is not None:
+                    raw = brotli.decompress(raw)
+                elif self._body_encoding not in {"", "identity"}:
+                    raise HTTPException(status_code=415, detail="Unsupported Content-Encoding.")
+
+                if self._body_is_msgpack and raw:
+                    raw = json.dumps(msgpack.unpackb(raw)).encode()
+            except HTTPException:
+                raise
+            except Exception as exc:
+                raise HTTPException(status_code=400, detail="Malformed encoded request body.") from exc
+
+            self._decoded_body = raw
+        return self._decoded_body
+
+
+def _negotiate_response(request: Request, response: Response) -> Response:
+    if not isinstance(response, JSONResponse):
+        return response
+
+    body = bytes(response.body)
+    media_type = "application/json"
+    if MSGPACK_MEDIA_TYPE in request.headers.get("accept", "").lower():
+        body = msgpack.packb(json.loads(body))
+        media_type = MSGPACK_MEDIA_TYPE
+
+    accepted = {
+        token.split(";")[0].strip()
+        for token in request.headers.get("accept-encoding", "").lower().split(",")
+    }
+    content_encoding: str | None = None
+    if len(body) >= COMPRESSION_MIN_BYTES:
+        if "br" in accepted and brotli is not None:
+            body = brotli.compress(body, quality=5)
+            content_encoding = "br"
+        elif "gzip" in accepted:
+            body = gzip.compress(body, compresslevel=6)
+            content_encoding = "gzip"
+
+    if media_type == response.media_type and content_encoding is None:
+        response.headers["vary"] = "Accept, Accept-Encoding"
+        return response
+
+    headers = {
+        key: value
+        for key, value in response.headers.items()
+        if key not in {"content-length", "content-type"}
+    }
+    headers["vary"] = "Accept, Accept-Encoding"
+    if content_encoding is not None:
+        headers["content-encoding"] = content_encoding
+
+    return Response(
+        content=body,
+        status_code=response.status_code,
+        headers=headers,
+        media_type=media_type,
+        background=response.background,
+    )
+
+
+class _CompactRoute(APIRoute):
+    def get_route_handler(self) -> Callable[[Request], Awaitable[Response]]:
+        original_handler = super().get_route_handler()
+
+        async def _handler(request: Request) -> Response:
+            request = _CompactRequest(request.scope, request.receive)
+            response = await original_handler(request)
+            return _negotiate_response(request, response)
+
+        return _handler
+
+
+def _utcnow_iso() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+def _assert_cloud_api_key(x_api_key: str | None) -> None:
+    if REMOTE_AUTH_REQUIRED and not CLOUD_API_KEY:
+        raise HTTPException(
+            status_code=503,
+            detail="Remote API auth is required but CLOUD_API_KEY is not configured.",
+        )
+
+    if CLOUD_API_KEY and x_api_key != CLOUD_API_KEY:
+        raise HTTPException(status_code=401, detail="Invalid API key.")
+
+
+def _assert_log_access(x_api_key: str | None) -> None:
+    # A local backend serves its own history and audit log as openly as its MDC
+    # routes, unless a CLOUD_API_KEY has been set on it.
+    if APP_MODE == "local" and not CLOUD_API_KEY:
+        return
+
+    _assert_cloud_api_key(x_api_key)
+
+
+def _parse_datetime_arg(raw_value: str) -> datetime:
+    value = raw_value.strip()
+    candidates = [value]
+    if value.endswith("Z"):
+        candidates.insert(0, value[:-1] + "+00:00")
+
+    for candidate in candidates:
+        try:
+            return datetime.fromisoformat(candidate)
+        except ValueError:
+            continue
+
+    for fmt in ("%Y-%m-%d %H:%M", "%Y-%m-%d %H:%M:%S"):
+        try:
+            return datetime.strptime(value, fmt)
+        except ValueError:
+            continue
+
+    raise ValueError(
+        "Invalid datetime value. Use ISO format (example: 2026-02-26T18:45:00)."
+    )
+
+
+def _parse_utc_datetime_arg(raw_value: str) -> datetime:
+    parsed = _parse_datetime_arg(raw_value)
+    return parsed if parsed.tzinfo is not None else parsed.replace(tzinfo=timezone.utc)
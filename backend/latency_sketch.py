@@ -0,0 +1,38 @@
+import math
+from typing import Iterable
+
+# Log-bucketed quantile sketch (DDSketch style): every value lands in bucket
+# ceil(log_gamma(value)), so any quantile read back is within RELATIVE_ACCURACY of
+# the true sample while a whole distribution costs a few hundred counters.
+RELATIVE_ACCURACY = 0.02
+MIN_VALUE_MS = 0.1
+
+_GAMMA = (1 + RELATIVE_ACCURACY) / (1 - RELATIVE_ACCURACY)
+_LOG_GAMMA = math.log(_GAMMA)
+
+
+def bucket_index(value_ms: float) -> int:
+    return math.ceil(math.log(max(value_ms, MIN_VALUE_MS)) / _LOG_GAMMA)
+
+
+def bucket_value(index: int) -> float:
+    return 2 * _GAMMA**index / (_GAMMA + 1)
+
+
+def quantiles(buckets: Iterable[tuple[int, int]], qs: Iterable[float]) -> tuple[int, dict[float, float | None]]:
+    ordered = sorted(buckets)
+    total = sum(count for _index, count in ordered)
+    result: dict[float, float | None] = {}
+    for q in qs:
+        if not total:
+            result[q] = None
+            continue
+
+        rank = q * (total - 1)
+        seen = 0
+        for index, count in ordered:
+            seen += count
+            if seen > rank:
+                result[q] = bucket_value(index)
+                break
+    return total, result
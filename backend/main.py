@@ -1,31 +1,49 @@
 import asyncio
 import os
-from datetime import datetime, time as dt_time, timezone
-from enum import Enum
-from typing import Any
-from uuid import uuid4
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta, timezone
+from typing import Any, AsyncIterator
 
 from fastapi import FastAPI, Header, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel, Field
-from samsung_mdc import MDC
-
-app = FastAPI(title="Samsung TV Control API")
-
-CONNECTION_TEST_TIMEOUT_SECONDS = float(os.getenv("CONNECTION_TEST_TIMEOUT_SECONDS", "8"))
-AGENT_SHARED_SECRET = os.getenv("AGENT_SHARED_SECRET", "").strip()
-CLOUD_API_KEY = os.getenv("CLOUD_API_KEY", "").strip()
-REMOTE_AUTH_REQUIRED = os.getenv("REMOTE_AUTH_REQUIRED", "true").strip().lower() in {
-    "1",
-    "true",
-    "yes",
-    "on",
-}
 
-_remote_lock = asyncio.Lock()
-_remote_jobs: dict[str, dict[str, Any]] = {}
-_remote_queue_by_agent: dict[str, list[str]] = {}
-_agent_state: dict[str, dict[str, Any]] = {}
+from common import (
+    APP_MODE,
+    AUDIT_FLUSH_SECONDS,
+    STATUS_HISTORY_FLUSH_SECONDS,
+    _assert_log_access,
+    _audit,
+    _background_loops,
+    _CompactRoute,
+    _parse_utc_datetime_arg,
+    _shutdown_hooks,
+    _startup_hooks,
+    _status_history,
+)
+from mdc_catalog import router as catalog_router
+
+if APP_MODE not in {"all", "cloud", "local"}:
+    raise RuntimeError(f"Invalid APP_MODE {APP_MODE!r}. Use all, cloud, or local.")
+
+
+@asynccontextmanager
+async def _lifespan(_app: FastAPI) -> AsyncIterator[None]:
+    for hook in _startup_hooks:
+        await hook()
+    tasks = [asyncio.create_task(loop()) for loop in _background_loops]
+    try:
+        yield
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        for hook in _shutdown_hooks:
+            await hook()
+
+
+app = FastAPI(title="Samsung TV Control API", lifespan=_lifespan)
+app.router.route_class = _CompactRoute
+
 
 DEFAULT_FRONTEND_ORIGINS = {
     "http://localhost:5173",
@@ -57,816 +75,168 @@ app.add_middleware(
     allow_credentials=False,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Health-Tier"],
 )
 
 
-class ConnectionRequest(BaseModel):
-    ip: str
-    port: int = Field(default=1515, ge=1, le=65535)
-    display_id: int = Field(default=0, ge=0, le=255)
-    protocol: str = "AUTO"
-
-
-class MdcExecuteRequest(ConnectionRequest):
-    command: str
-    args: list[str | int | float | bool] = Field(default_factory=list)
-    operation: str = "auto"
-
-
-class RemoteEnqueueRequest(BaseModel):
-    agent_id: str = Field(min_length=1, max_length=128)
-    kind: str = Field(min_length=1, max_length=64)
-    payload: dict[str, Any] = Field(default_factory=dict)
-
-
-class AgentHeartbeatRequest(BaseModel):
-    version: str | None = None
-    hostname: str | None = None
-    local_backend_url: str | None = None
-
-
-class AgentPollRequest(BaseModel):
-    max_jobs: int = Field(default=5, ge=1, le=50)
-
-
-class AgentJobResultRequest(BaseModel):
-    status: str = Field(min_length=1, max_length=32)
-    result: dict[str, Any] | None = None
-    error: str | None = None
-
-
-def _utcnow_iso() -> str:
-    return datetime.now(timezone.utc).isoformat()
-
-
-def _assert_cloud_api_key(x_api_key: str | None) -> None:
-    if REMOTE_AUTH_REQUIRED and not CLOUD_API_KEY:
-        raise HTTPException(
-            status_code=503,
-            detail="Remote API auth is required but CLOUD_API_KEY is not configured.",
-        )
-
-    if CLOUD_API_KEY and x_api_key != CLOUD_API_KEY:
-        raise HTTPException(status_code=401, detail="Invalid API key.")
-
-
-def _assert_agent_secret(x_agent_token: str | None) -> None:
-    if REMOTE_AUTH_REQUIRED and not AGENT_SHARED_SECRET:
-        raise HTTPException(
-            status_code=503,
-            detail="Remote agent auth is required but AGENT_SHARED_SECRET is not configured.",
-        )
-
-    if AGENT_SHARED_SECRET and x_agent_token != AGENT_SHARED_SECRET:
-        raise HTTPException(status_code=401, detail="Invalid agent token.")
-
-
-def resolve_protocol(protocol: str, port: int) -> str:
-    selected_protocol = protocol.strip().upper()
-    if selected_protocol not in {"AUTO", "SIGNAGE_MDC"}:
-        raise HTTPException(
-            status_code=400,
-            detail="Invalid protocol. Use AUTO or SIGNAGE_MDC.",
-        )
-
-    if selected_protocol == "AUTO":
-        return "SIGNAGE_MDC"
-
-    return selected_protocol
-
-
-def _connectivity_error_detail(protocol: str, exc: Exception) -> str:
-    if isinstance(exc, asyncio.TimeoutError):
-        return (
-            "Connectivity test timed out. "
-            "Check the IP/port/protocol values and confirm the display is reachable."
-        )
-
-    return f"Connectivity test failed: {exc}"
-
-
-def _is_nak_error_code_1(exc: Exception) -> bool:
-    message = str(exc).lower()
-    return "negative acknowledgement" in message and "error_code 1" in message
-
-
-def _parse_time_arg(raw_value: str) -> dt_time:
-    value = raw_value.strip()
-    for fmt in ("%H:%M", "%H:%M:%S"):
-        try:
-            return datetime.strptime(value, fmt).time()
-        except ValueError:
-            continue
-
-    raise ValueError(
-        "Invalid time value. Use HH:MM or HH:MM:SS (example: 09:30 or 21:45:00)."
-    )
-
-
-def _parse_datetime_arg(raw_value: str) -> datetime:
-    value = raw_value.strip()
-    candidates = [value]
-    if value.endswith("Z"):
-        candidates.insert(0, value[:-1] + "+00:00")
-
-    for candidate in candidates:
-        try:
-            return datetime.fromisoformat(candidate)
-        except ValueError:
-            continue
-
-    for fmt in ("%Y-%m-%d %H:%M", "%Y-%m-%d %H:%M:%S"):
-        try:
-            return datetime.strptime(value, fmt)
-        except ValueError:
-            continue
-
-    raise ValueError(
-        "Invalid datetime value. Use ISO format (example: 2026-02-26T18:45:00)."
-    )
-
-
-def _coerce_mdc_field_value(raw_value: Any, field: Any) -> Any:
-    field_type = type(field).__name__.lower()
-    enum_obj = getattr(field, "enum", None)
-
-    if field_type == "bitmask":
-        values: list[Any]
-        if isinstance(raw_value, str):
-            values = [
-                token.strip()
-                for token in raw_value.split(",")
-                if token.strip().strip("[]")
-            ]
-        elif isinstance(raw_value, (list, tuple, set)):
-            values = list(raw_value)
-        else:
-            values = [raw_value]
-
-        if not enum_obj:
-            return values
-
-        enum_name_to_value = {member.name.upper(): int(member.value) for member in enum_obj}
-        coerced_values: list[int] = []
-        for item in values:
-            if isinstance(item, bool):
-                coerced_values.append(int(item))
-                continue
-
-            if isinstance(item, (int, float)):
-                coerced_values.append(int(item))
-                continue
-
-            token = str(item).strip()
-            if not token:
-                continue
-
-            if token.upper() in enum_name_to_value:
-                coerced_values.append(enum_name_to_value[token.upper()])
-                continue
-
-            try:
-                coerced_values.append(int(token))
-            except ValueError as exc:
-                allowed = ", ".join(enum_name_to_value.keys())
-                raise ValueError(
-                    f"Invalid bitmask value '{token}'. Allowed values: {allowed}."
-                ) from exc
-
-        return coerced_values
-
-    if not isinstance(raw_value, str):
-        return raw_value
-
-    text = raw_value.strip()
-
-    if "datetime" in field_type:
-        return _parse_datetime_arg(text)
-
-    if field_type in {"time", "time12h"}:
-        return _parse_time_arg(text)
-
-    return raw_value
-
-
-def _coerce_command_args(
-    command_name: str,
-    command_obj: Any,
-    operation: str,
-    raw_args: list[str | int | float | bool],
-) -> list[Any]:
-    if not raw_args:
-        return []
-
-    fields = list(getattr(command_obj, "DATA", []))
-    if not fields:
-        return list(raw_args)
-
-    if command_name in {"timer_13", "timer_15"}:
-        if operation == "get":
-            parsed_timer_id = _parse_timer_id(raw_args[0])
-            return [parsed_timer_id] if parsed_timer_id is not None else []
-
-        first_arg = raw_args[0]
-        parsed_timer_id = _parse_timer_id(first_arg)
-        timer_data_raw = raw_args[1:] if parsed_timer_id is not None else raw_args
-
-        coerced_timer_data = [
-            _coerce_mdc_field_value(value, field)
-            for value, field in zip(timer_data_raw, fields)
-        ]
-        if len(timer_data_raw) > len(fields):
-            coerced_timer_data.extend(timer_data_raw[len(fields) :])
-
-        if parsed_timer_id is not None:
-            return [parsed_timer_id, *coerced_timer_data]
-
-        return coerced_timer_data
-
-    coerced = [_coerce_mdc_field_value(value, field) for value, field in zip(raw_args, fields)]
-    if len(raw_args) > len(fields):
-        coerced.extend(raw_args[len(fields) :])
-    return coerced
-
-
-def _parse_timer_id(raw_value: Any) -> int | None:
-    if isinstance(raw_value, bool):
-        return None
-
-    parsed: int | None = None
-    if isinstance(raw_value, int):
-        parsed = raw_value
-    elif isinstance(raw_value, float) and raw_value.is_integer():
-        parsed = int(raw_value)
-    elif isinstance(raw_value, str):
-        value = raw_value.strip()
-        if not value:
-            return None
-        try:
-            parsed = int(value)
-        except ValueError:
-            return None
-
-    if parsed is None:
-        return None
-
-    if parsed < 1 or parsed > 7:
-        raise ValueError("timer_id must be between 1 and 7.")
-
-    return parsed
-
-
-def _resolve_timer_args(operation: str, resolved_args: list[Any]) -> tuple[int, tuple[Any, ...]]:
-    default_timer_id = 1
-
-    if operation == "get":
-        if not resolved_args:
-            return default_timer_id, ()
-
-        parsed_timer_id = _parse_timer_id(resolved_args[0])
-        return parsed_timer_id if parsed_timer_id is not None else default_timer_id, ()
-
-    if not resolved_args:
-        return default_timer_id, ()
-
-    parsed_timer_id = _parse_timer_id(resolved_args[0])
-    if parsed_timer_id is None:
-        return default_timer_id, tuple(resolved_args)
-
-    return parsed_timer_id, tuple(resolved_args[1:])
-
-
-def _command_fields(command_obj: Any) -> list[dict[str, Any]]:
-    fields: list[dict[str, Any]] = []
-    for field in getattr(command_obj, "DATA", []):
-        enum_obj = getattr(field, "enum", None)
-        range_obj = getattr(field, "range", None)
-        enum_values = [m.name for m in enum_obj] if enum_obj else []
-
-        range_payload = None
-        if isinstance(range_obj, range):
-            range_payload = {
-                "min": range_obj.start,
-                "max": range_obj.stop - 1,
-            }
-
-        fields.append(
-            {
-                "name": getattr(field, "name", "arg"),
-                "type": type(field).__name__,
-                "enum": enum_values,
-                "range": range_payload,
-            }
-        )
-
-    return fields
-
-
-def _serialize_mdc_value(value: Any) -> Any:
-    if isinstance(value, Enum):
-        return value.name
-
-    if isinstance(value, datetime):
-        return value.isoformat()
-
-    if isinstance(value, dt_time):
-        if value.second == 0 and value.microsecond == 0:
-            return value.strftime("%H:%M")
-        return value.strftime("%H:%M:%S")
-
-    if isinstance(value, bytes):
-        return value.hex()
-
-    if isinstance(value, tuple):
-        return [_serialize_mdc_value(item) for item in value]
-
-    if isinstance(value, list):
-        return [_serialize_mdc_value(item) for item in value]
-
-    if isinstance(value, dict):
-        return {str(key): _serialize_mdc_value(item) for key, item in value.items()}
-
-    return value
-
-
-@app.get("/api/mdc/commands")
-async def list_mdc_commands() -> dict[str, list[dict[str, Any]]]:
-    payload: list[dict[str, Any]] = []
-    for name in sorted(MDC._commands.keys()):
-        command_obj = MDC._commands[name]
-        payload.append(
-            {
-                "name": name,
-                "supports_get": bool(getattr(command_obj, "GET", False)),
-                "supports_set": bool(getattr(command_obj, "SET", False)),
-                "fields": _command_fields(command_obj),
-            }
-        )
+@app.get("/health")
+async def health() -> dict[str, str]:
+    return {"status": "ok"}
 
-    return {"commands": payload}
 
+async def _flush_audit_log() -> None:
+    rows = _audit.drain()
+    await asyncio.to_thread(_audit.write, rows)
 
-async def _tcp_port_open(ip: str, port: int, timeout: float) -> bool:
-    try:
-        connect_coro = asyncio.open_connection(ip, port)
-        _reader, writer = await asyncio.wait_for(connect_coro, timeout=timeout)
-        writer.close()
-        await writer.wait_closed()
-        return True
-    except Exception:
-        return False
-
-
-@app.get("/api/probe/{ip}")
-async def auto_probe_ports(
-    ip: str,
-    display_id: int = 0,
-    timeout: float = 1.5,
-) -> dict[str, Any]:
-    if display_id < 0 or display_id > 255:
-        raise HTTPException(status_code=400, detail="Invalid display_id. Use 0-255.")
-
-    if timeout < 0.2 or timeout > 20:
-        raise HTTPException(status_code=400, detail="Invalid timeout. Use 0.2-20 seconds.")
-
-    candidates: list[tuple[int, str]] = [
-        (1515, "SIGNAGE_MDC"),
-    ]
-
-    attempts: list[dict[str, Any]] = []
-    found_port: int | None = None
-    found_protocol: str | None = None
-
-    for port, protocol in candidates:
-        tcp_open = await _tcp_port_open(ip, port, timeout=timeout)
-        if not tcp_open:
-            attempts.append({
-                "port": port,
-                "protocol": protocol,
-                "success": False,
-                "verified": False,
-                "error": "TCP port closed",
-            })
-            continue
 
+async def _audit_flush_loop() -> None:
+    while True:
+        await asyncio.sleep(AUDIT_FLUSH_SECONDS)
         try:
-            async def _probe_mdc() -> None:
-                async with MDC(f"{ip}:{port}") as mdc:
-                    await mdc.status(display_id)
-
-            await asyncio.wait_for(_probe_mdc(), timeout=timeout)
-
-            attempts.append({
-                "port": port,
-                "protocol": protocol,
-                "success": True,
-                "verified": True,
-                "error": None,
-            })
-            found_port = port
-            found_protocol = protocol
-            break
+            await _flush_audit_log()
         except Exception as exc:
-            attempts.append({
-                "port": port,
-                "protocol": protocol,
-                "success": True,
-                "verified": False,
-                "error": f"TCP open; protocol verification failed: {exc}",
-            })
-            found_port = port
-            found_protocol = protocol
-            break
-
-    if found_port is None or found_protocol is None:
-        return {
-            "status": "not_found",
-            "found": False,
-            "tv": ip,
-            "display_id": display_id,
-            "attempts": attempts,
-        }
-
-    verified = any(
-        item.get("port") == found_port and item.get("success") and item.get("verified")
-        for item in attempts
-    )
-
-    return {
-        "status": "success",
-        "found": True,
-        "verified": verified,
-        "tv": ip,
-        "display_id": display_id,
-        "port": found_port,
-        "protocol": found_protocol,
-        "attempts": attempts,
-    }
-
+            print(f"[audit] flush failed: {exc}")
 
-@app.post("/api/mdc/execute")
-async def execute_mdc_command(payload: MdcExecuteRequest) -> dict[str, Any]:
-    selected_protocol = resolve_protocol(payload.protocol, payload.port)
-    if selected_protocol != "SIGNAGE_MDC":
-        raise HTTPException(status_code=400, detail="MDC execute endpoint requires SIGNAGE_MDC protocol.")
 
-    command_name = payload.command.strip()
-    if command_name not in MDC._commands:
-        raise HTTPException(status_code=400, detail="Unknown MDC command.")
+_background_loops.append(_audit_flush_loop)
+_shutdown_hooks.append(_flush_audit_log)
 
-    command_obj = MDC._commands[command_name]
-    operation = payload.operation.strip().lower()
-    if operation not in {"auto", "get", "set"}:
-        raise HTTPException(status_code=400, detail="Invalid operation. Use auto, get, or set.")
 
-    supports_get = bool(getattr(command_obj, "GET", False))
-    supports_set = bool(getattr(command_obj, "SET", False))
-
-    if operation == "auto":
-        operation = "get" if (supports_get and not payload.args) else "set"
-
-    if operation == "get" and not supports_get:
-        raise HTTPException(status_code=400, detail=f"{command_name} does not support GET.")
+@app.get("/api/audit")
+async def list_audit_log(
+    device: str | None = None,
+    action: str | None = None,
+    command: str | None = None,
+    agent_id: str | None = None,
+    since: str | None = None,
+    until: str | None = None,
+    cursor: str | None = None,
+    limit: int = 100,
+    x_api_key: str | None = Header(default=None),
+) -> dict[str, Any]:
+    _assert_log_access(x_api_key)
 
-    if operation == "set" and not supports_set:
-        raise HTTPException(status_code=400, detail=f"{command_name} does not support SET.")
+    if limit < 1 or limit > 500:
+        raise HTTPException(status_code=400, detail="Invalid limit. Use 1-500.")
 
     try:
-        resolved_args = _coerce_command_args(
-            command_name=command_name,
-            command_obj=command_obj,
-            operation=operation,
-            raw_args=payload.args,
-        )
+        since_ts = _parse_utc_datetime_arg(since).timestamp() if since else None
+        until_ts = _parse_utc_datetime_arg(until).timestamp() if until else None
     except ValueError as exc:
         raise HTTPException(status_code=400, detail=str(exc)) from exc
 
-    timer_payload: tuple[int, tuple[Any, ...]] | None = None
-    if command_name in {"timer_13", "timer_15"}:
-        try:
-            timer_payload = _resolve_timer_args(operation, resolved_args)
-        except ValueError as exc:
-            raise HTTPException(status_code=400, detail=str(exc)) from exc
-
-    async def _execute_for_display_id(display_id: int) -> Any:
-        target = f"{payload.ip}:{payload.port}"
-        async with MDC(target) as mdc:
-            method = getattr(mdc, command_name)
-
-            if timer_payload is not None:
-                timer_id, timer_data = timer_payload
-                if operation == "get":
-                    return await method(display_id, timer_id, ())
-                return await method(display_id, timer_id, timer_data)
-
-            if operation == "get":
-                return await method(display_id)
+    cursor_key: tuple[str, int] | None = None
+    if cursor:
+        day, _, raw_id = cursor.partition(":")
+        if not day.isdigit() or not raw_id.isdigit():
+            raise HTTPException(status_code=400, detail="Invalid cursor.")
+        cursor_key = (day, int(raw_id))
+
+    # Include this worker's entries that are still waiting for the next batch.
+    await _flush_audit_log()
+    entries, next_cursor = await asyncio.to_thread(
+        _audit.query,
+        device.strip() if device else None,
+        action.strip().lower() if action else None,
+        command.strip() if command else None,
+        agent_id.strip() if agent_id else None,
+        since_ts,
+        until_ts,
+        cursor_key,
+        limit,
+    )
+    return {"entries": entries, "next_cursor": next_cursor}
 
-            return await method(display_id, tuple(resolved_args))
 
-    candidate_display_ids: list[int] = []
-    for candidate in [payload.display_id, 0, 1]:
-        if candidate not in candidate_display_ids:
-            candidate_display_ids.append(candidate)
+async def _flush_status_history() -> None:
+    writes = _status_history.collect_dirty()
+    await asyncio.to_thread(_status_history.write, writes)
 
-    last_exc: Exception | None = None
-    used_display_id = payload.display_id
-    result: Any = None
 
-    for idx, candidate_display_id in enumerate(candidate_display_ids):
+async def _status_history_flush_loop() -> None:
+    while True:
+        await asyncio.sleep(STATUS_HISTORY_FLUSH_SECONDS)
         try:
-            result = await _execute_for_display_id(candidate_display_id)
-            used_display_id = candidate_display_id
-            break
+            await _flush_status_history()
         except Exception as exc:
-            last_exc = exc
+            print(f"[status-history] flush failed: {exc}")
 
-            is_first_try = idx == 0
-            if is_first_try and not _is_nak_error_code_1(exc):
-                raise HTTPException(status_code=502, detail=f"Failed to execute MDC command: {exc}") from exc
 
-            if not _is_nak_error_code_1(exc):
-                continue
-    else:
-        assert last_exc is not None
-        raise HTTPException(status_code=502, detail=f"Failed to execute MDC command: {last_exc}") from last_exc
-
-    serialized_result = _serialize_mdc_value(result)
-    result_values = serialized_result if isinstance(serialized_result, list) else [serialized_result]
-
-    return {
-        "status": "success",
-        "tv": payload.ip,
-        "display_id": used_display_id,
-        "port": payload.port,
-        "protocol": selected_protocol,
-        "command": command_name,
-        "operation": operation,
-        "args": payload.args,
-        "result": str(result),
-        "result_values": result_values,
-    }
+_background_loops.append(_status_history_flush_loop)
+_shutdown_hooks.append(_flush_status_history)
 
 
-@app.get("/health")
-async def health() -> dict[str, str]:
-    return {"status": "ok"}
-
-
-@app.get("/api/remote/agents")
-async def list_remote_agents(
-    x_api_key: str | None = Header(default=None),
-) -> dict[str, list[dict[str, Any]]]:
-    _assert_cloud_api_key(x_api_key)
-
-    agents: list[dict[str, Any]] = []
-    async with _remote_lock:
-        for agent_id, info in sorted(_agent_state.items(), key=lambda item: item[0]):
-            queue_depth = len(_remote_queue_by_agent.get(agent_id, []))
-            agents.append(
-                {
-                    "agent_id": agent_id,
-                    "last_seen": info.get("last_seen"),
-                    "version": info.get("version"),
-                    "hostname": info.get("hostname"),
-                    "local_backend_url": info.get("local_backend_url"),
-                    "queue_depth": queue_depth,
-                }
-            )
-
-    return {"agents": agents}
-
-
-@app.post("/api/remote/jobs")
-async def enqueue_remote_job(
-    payload: RemoteEnqueueRequest,
-    x_api_key: str | None = Header(default=None),
-) -> dict[str, Any]:
-    _assert_cloud_api_key(x_api_key)
-
-    job_id = str(uuid4())
-    created_at = _utcnow_iso()
-    job = {
-        "job_id": job_id,
-        "agent_id": payload.agent_id.strip(),
-        "kind": payload.kind.strip().lower(),
-        "payload": payload.payload,
-        "status": "queued",
-        "created_at": created_at,
-        "dispatched_at": None,
-        "finished_at": None,
-        "result": None,
-        "error": None,
-    }
-
-    async with _remote_lock:
-        _remote_jobs[job_id] = job
-        _remote_queue_by_agent.setdefault(job["agent_id"], []).append(job_id)
-
-    return {
-        "status": "queued",
-        "job_id": job_id,
-        "agent_id": job["agent_id"],
-        "kind": job["kind"],
-        "created_at": created_at,
-    }
-
-
-@app.get("/api/remote/jobs/{job_id}")
-async def get_remote_job_status(
-    job_id: str,
+@app.get("/api/status/history")
+async def get_status_history(
+    key: str,
+    agent_id: str | None = None,
+    start: str | None = None,
+    end: str | None = None,
+    buckets: int = 96,
     x_api_key: str | None = Header(default=None),
 ) -> dict[str, Any]:
-    _assert_cloud_api_key(x_api_key)
-
-    async with _remote_lock:
-        job = _remote_jobs.get(job_id)
-        if job is None:
-            raise HTTPException(status_code=404, detail="Job not found.")
-        return job
-
-
-@app.post("/api/agent/{agent_id}/heartbeat")
-async def agent_heartbeat(
-    agent_id: str,
-    payload: AgentHeartbeatRequest,
-    x_agent_token: str | None = Header(default=None),
-) -> dict[str, str]:
-    _assert_agent_secret(x_agent_token)
-
-    normalized = agent_id.strip()
-    if not normalized:
-        raise HTTPException(status_code=400, detail="Invalid agent_id.")
-
-    async with _remote_lock:
-        _agent_state[normalized] = {
-            "last_seen": _utcnow_iso(),
-            "version": payload.version,
-            "hostname": payload.hostname,
-            "local_backend_url": payload.local_backend_url,
-        }
-
-    return {"status": "ok", "agent_id": normalized}
-
-
-@app.post("/api/agent/{agent_id}/poll")
-async def agent_poll_jobs(
-    agent_id: str,
-    payload: AgentPollRequest,
-    x_agent_token: str | None = Header(default=None),
-) -> dict[str, Any]:
-    _assert_agent_secret(x_agent_token)
-
-    normalized = agent_id.strip()
-    if not normalized:
-        raise HTTPException(status_code=400, detail="Invalid agent_id.")
-
-    jobs: list[dict[str, Any]] = []
-    async with _remote_lock:
-        queue = _remote_queue_by_agent.get(normalized, [])
-        take = min(payload.max_jobs, len(queue))
-        job_ids = queue[:take]
-        del queue[:take]
-
-        if not queue and normalized in _remote_queue_by_agent:
-            _remote_queue_by_agent.pop(normalized, None)
-
-        for job_id in job_ids:
-            job = _remote_jobs.get(job_id)
-            if job is None or job.get("status") != "queued":
-                continue
-            job["status"] = "dispatched"
-            job["dispatched_at"] = _utcnow_iso()
-            jobs.append(job)
-
-        _agent_state[normalized] = {
-            **_agent_state.get(normalized, {}),
-            "last_seen": _utcnow_iso(),
-        }
-
-    return {"agent_id": normalized, "jobs": jobs}
-
-
-@app.post("/api/agent/{agent_id}/jobs/{job_id}/result")
-async def agent_submit_result(
-    agent_id: str,
-    job_id: str,
-    payload: AgentJobResultRequest,
-    x_agent_token: str | None = Header(default=None),
-) -> dict[str, Any]:
-    _assert_agent_secret(x_agent_token)
-
-    normalized = agent_id.strip()
-    if not normalized:
-        raise HTTPException(status_code=400, detail="Invalid agent_id.")
+    _assert_log_access(x_api_key)
 
-    status = payload.status.strip().lower()
-    if status not in {"success", "error"}:
-        raise HTTPException(status_code=400, detail="status must be success or error.")
+    if buckets < 1 or buckets > 2000:
+        raise HTTPException(status_code=400, detail="Invalid buckets. Use 1-2000.")
 
-    async with _remote_lock:
-        job = _remote_jobs.get(job_id)
-        if job is None:
-            raise HTTPException(status_code=404, detail="Job not found.")
-
-        if job.get("agent_id") != normalized:
-            raise HTTPException(status_code=403, detail="Job does not belong to this agent.")
+    try:
+        end_dt = _parse_utc_datetime_arg(end) if end else datetime.now(timezone.utc)
+        start_dt = _parse_utc_datetime_arg(start) if start else end_dt - timedelta(days=1)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
 
-        job["status"] = "completed" if status == "success" else "failed"
-        job["finished_at"] = _utcnow_iso()
-        job["result"] = payload.result
-        job["error"] = payload.error
+    if end_dt <= start_dt:
+        raise HTTPException(status_code=400, detail="end must be after start.")
+
+    history_key = f"{agent_id.strip()}/{key.strip()}" if agent_id else key.strip()
+    summary = await asyncio.to_thread(
+        _status_history.summarize,
+        history_key,
+        start_dt.timestamp(),
+        end_dt.timestamp(),
+        buckets,
+        _status_history.snapshot(history_key),
+    )
 
-        _agent_state[normalized] = {
-            **_agent_state.get(normalized, {}),
-            "last_seen": _utcnow_iso(),
-        }
+    def _iso(ts: float) -> str:
+        return datetime.fromtimestamp(ts, timezone.utc).isoformat()
 
+    uptime_ratio = summary["uptime_ratio"]
     return {
-        "status": "recorded",
-        "job_id": job_id,
-        "job_status": "completed" if status == "success" else "failed",
+        "key": history_key,
+        "start": start_dt.isoformat(),
+        "end": end_dt.isoformat(),
+        "uptime_percent": round(uptime_ratio * 100, 3) if uptime_ratio is not None else None,
+        "coverage_percent": round(summary["coverage_ratio"] * 100, 3),
+        "outages": [
+            {
+                "start": _iso(outage_start),
+                "end": _iso(outage_end),
+                "duration_seconds": round(outage_end - outage_start, 3),
+            }
+            for outage_start, outage_end in summary["outages"]
+        ],
+        "timeline": [
+            {
+                "start": _iso(bucket_start),
+                "online_ratio": round(ratio, 4) if ratio is not None else None,
+            }
+            for bucket_start, ratio in summary["timeline"]
+        ],
     }
 
 
-@app.get("/api/tv/{ip}/{command}")
-async def control_tv(
-    ip: str,
-    command: str,
-    display_id: int = 0,
-    port: int = 1515,
-    protocol: str = "AUTO",
-) -> dict[str, str | int]:
-    normalized = command.lower()
-    if normalized not in {"on", "off"}:
-        raise HTTPException(status_code=400, detail="Invalid command. Use 'on' or 'off'.")
+# Routers are imported on demand: the cloud-only app never loads samsung_mdc
+# (the command catalog imports it lazily), and a local-only app skips the broker.
+if APP_MODE in {"all", "cloud"}:
+    from broker_api import router as broker_router
 
-    if display_id < 0 or display_id > 255:
-        raise HTTPException(status_code=400, detail="Invalid display_id. Use 0-255.")
+    app.include_router(broker_router)
 
-    if port < 1 or port > 65535:
-        raise HTTPException(status_code=400, detail="Invalid port. Use 1-65535.")
+if APP_MODE in {"all", "local"}:
+    from mdc_api import router as mdc_router
 
-    selected_protocol = resolve_protocol(protocol, port)
+    app.include_router(mdc_router)
 
-    try:
-        target = f"{ip}:{port}"
-        async with MDC(target) as mdc:
-            if normalized == "on":
-                await mdc.power(display_id, ("ON",))
-            else:
-                await mdc.power(display_id, ("OFF",))
-    except Exception as exc:
-        raise HTTPException(status_code=502, detail=f"Failed to send command: {exc}") from exc
-
-    response: dict[str, str | int] = {
-        "status": "success",
-        "tv": ip,
-        "command": normalized,
-        "display_id": display_id,
-        "port": port,
-        "protocol": selected_protocol,
-    }
-    return response
-
-
-@app.get("/api/test/{ip}")
-async def test_tv_connection(
-    ip: str,
-    display_id: int = 0,
-    port: int = 1515,
-    protocol: str = "AUTO",
-) -> dict[str, str | int | bool]:
-    if display_id < 0 or display_id > 255:
-        raise HTTPException(status_code=400, detail="Invalid display_id. Use 0-255.")
-
-    if port < 1 or port > 65535:
-        raise HTTPException(status_code=400, detail="Invalid port. Use 1-65535.")
-
-    selected_protocol = resolve_protocol(protocol, port)
-
-    try:
-        target = f"{ip}:{port}"
-
-        async def _probe_mdc() -> Any:
-            async with MDC(target) as mdc:
-                return await mdc.status(display_id)
-
-        status_raw = await asyncio.wait_for(
-            _probe_mdc(),
-            timeout=CONNECTION_TEST_TIMEOUT_SECONDS,
-        )
-        return {
-            "status": "success",
-            "reachable": True,
-            "tv": ip,
-            "display_id": display_id,
-            "port": port,
-            "protocol": selected_protocol,
-            "mdc_status": str(status_raw),
-        }
-    except Exception as exc:
-        raise HTTPException(
-            status_code=502,
-            detail=_connectivity_error_detail(selected_protocol, exc),
-        ) from exc
+app.include_router(catalog_router)
@@ -0,0 +1,1424 @@
+import asyncio
+import time
+from datetime import datetime, time as dt_time
+from enum import Enum
+from functools import partial
+from typing import Any, Awaitable, Callable
+
+from fastapi import APIRouter, HTTPException
+from pydantic import BaseModel, Field
+from samsung_mdc import MDC
+from samsung_mdc.connection import pack_payload
+
+from common import (
+    ADAPTIVE_TIMEOUT_MAX_SECONDS,
+    ADAPTIVE_TIMEOUT_MIN_SECONDS,
+    CONNECTION_TEST_TIMEOUT_SECONDS,
+    HEALTH_CHECK_TIER,
+    HEALTH_DEEP_INTERVAL_SECONDS,
+    MDC_BROADCAST_DISPLAY_ID,
+    MDC_GET_RETRY_ENABLED,
+    PROBE_DEFAULT_TIMEOUT_SECONDS,
+    REMOTE_BATCH_MAX_TARGETS,
+    _audit,
+    _CompactRoute,
+    _parse_datetime_arg,
+    _startup_hooks,
+    _status_history,
+)
+from mdc_catalog import command_catalog
+
+# Local side: talks MDC to the displays on this network.
+router = APIRouter(route_class=_CompactRoute)
+
+
+class ConnectionRequest(BaseModel):
+    ip: str
+    port: int = Field(default=1515, ge=1, le=65535)
+    display_id: int = Field(default=0, ge=0, le=255)
+    protocol: str = "AUTO"
+
+
+class MdcExecuteRequest(ConnectionRequest):
+    command: str
+    args: list[str | int | float | bool] = Field(default_factory=list)
+    operation: str = "auto"
+    # Several displays daisy-chained behind ip:port, run over one session.
+    display_ids: list[int] = Field(default_factory=list, max_length=253)
+
+
+class DesiredMdcSetting(BaseModel):
+    command: str
+    args: list[str | int | float | bool] = Field(min_length=1)
+
+
+class MdcReconcileTarget(BaseModel):
+    ip: str
+    port: int = Field(default=1515, ge=1, le=65535)
+    display_id: int = Field(default=0, ge=0, le=255)
+
+
+class MdcReconcileRequest(BaseModel):
+    targets: list[MdcReconcileTarget] = Field(min_length=1, max_length=REMOTE_BATCH_MAX_TARGETS)
+    desired: list[DesiredMdcSetting] = Field(min_length=1, max_length=32)
+    dry_run: bool = False
+    concurrency: int = Field(default=8, ge=1, le=64)
+
+
+class MdcTimerSetting(BaseModel):
+    timer_id: int = Field(ge=1, le=7)
+    args: list[str | int | float | bool] = Field(min_length=1)
+
+
+class MdcTimersRequest(BaseModel):
+    targets: list[MdcReconcileTarget] = Field(min_length=1, max_length=REMOTE_BATCH_MAX_TARGETS)
+    # auto = timer_15, falling back to timer_13 when the display answers with 13 bytes.
+    variant: str = "auto"
+    # Empty reads the schedule; otherwise these timers are written, then all are read back.
+    timers: list[MdcTimerSetting] = Field(default_factory=list, max_length=7)
+    concurrency: int = Field(default=8, ge=1, le=64)
+
+
+def resolve_protocol(protocol: str, port: int) -> str:
+    selected_protocol = protocol.strip().upper()
+    if selected_protocol not in {"AUTO", "SIGNAGE_MDC"}:
+        raise HTTPException(
+            status_code=400,
+            detail="Invalid protocol. Use AUTO or SIGNAGE_MDC.",
+        )
+
+    if selected_protocol == "AUTO":
+        return "SIGNAGE_MDC"
+
+    return selected_protocol
+
+
+def _connectivity_error_detail(protocol: str, exc: Exception) -> str:
+    if isinstance(exc, asyncio.TimeoutError):
+        return (
+            "Connectivity test timed out. "
+            "Check the IP/port/protocol values and confirm the display is reachable."
+        )
+
+    return f"Connectivity test failed: {exc}"
+
+
+def _is_nak_error_code_1(exc: Exception) -> bool:
+    message = str(exc).lower()
+    return "negative acknowledgement" in message and "error_code 1" in message
+
+
+def _parse_time_arg(raw_value: str) -> dt_time:
+    value = raw_value.strip()
+    for fmt in ("%H:%M", "%H:%M:%S"):
+        try:
+            return datetime.strptime(value, fmt).time()
+        except ValueError:
+            continue
+
+    raise ValueError(
+        "Invalid time value. Use HH:MM or HH:MM:SS (example: 09:30 or 21:45:00)."
+    )
+
+
+def _coerce_mdc_field_value(raw_value: Any, field: Any) -> Any:
+    field_type = type(field).__name__.lower()
+    enum_obj = getattr(field, "enum", None)
+
+    if field_type == "bitmask":
+        values: list[Any]
+        if isinstance(raw_value, str):
+            values = [
+                token.strip()
+                for token in raw_value.split(",")
+                if token.strip().strip("[]")
+            ]
+        elif isinstance(raw_value, (list, tuple, set)):
+            values = list(raw_value)
+        else:
+            values = [raw_value]
+
+        if not enum_obj:
+            return values
+
+        enum_name_to_value = {member.name.upper(): int(member.value) for member in enum_obj}
+        coerced_values: list[int] = []
+        for item in values:
+            if isinstance(item, bool):
+                coerced_values.append(int(item))
+                continue
+
+            if isinstance(item, (int, float)):
+                coerced_values.append(int(item))
+                continue
+
+            token = str(item).strip()
+            if not token:
+                continue
+
+            if token.upper() in enum_name_to_value:
+                coerced_values.append(enum_name_to_value[token.upper()])
+                continue
+
+            try:
+                coerced_values.append(int(token))
+            except ValueError as exc:
+                allowed = ", ".join(enum_name_to_value.keys())
+                raise ValueError(
+                    f"Invalid bitmask value '{token}'. Allowed values: {allowed}."
+                ) from exc
+
+        return coerced_values
+
+    if not isinstance(raw_value, str):
+        return raw_value
+
+    text = raw_value.strip()
+
+    if "datetime" in field_type:
+        return _parse_datetime_arg(text)
+
+    if field_type in {"time", "time12h"}:
+        return _parse_time_arg(text)
+
+    return raw_value
+
+
+def _coerce_command_args(
+    command_name: str,
+    command_obj: Any,
+    operation: str,
+    raw_args: list[str | int | float | bool],
+) -> list[Any]:
+    if not raw_args:
+        return []
+
+    fields = list(getattr(command_obj, "DATA", []))
+    if not fields:
+        return list(raw_args)
+
+    if command_name in {"timer_13", "timer_15"}:
+        if operation == "get":
+            parsed_timer_id = _parse_timer_id(raw_args[0])
+            return [parsed_timer_id] if parsed_timer_id is not None else []
+
+        first_arg = raw_args[0]
+        parsed_timer_id = _parse_timer_id(first_arg)
+        timer_data_raw = raw_args[1:] if parsed_timer_id is not None else raw_args
+
+        coerced_timer_data = [
+            _coerce_mdc_field_value(value, field)
+            for value, field in zip(timer_data_raw, fields)
+        ]
+        if len(timer_data_raw) > len(fields):
+            coerced_timer_data.extend(timer_data_raw[len(fields) :])
+
+        if parsed_timer_id is not None:
+            return [parsed_timer_id, *coerced_timer_data]
+
+        return coerced_timer_data
+
+    coerced = [_coerce_mdc_field_value(value, field) for value, field in zip(raw_args, fields)]
+    if len(raw_args) > len(fields):
+        coerced.extend(raw_args[len(fields) :])
+    return coerced
+
+
+def _parse_timer_id(raw_value: Any) -> int | None:
+    if isinstance(raw_value, bool):
+        return None
+
+    parsed: int | None = None
+    if isinstance(raw_value, int):
+        parsed = raw_value
+    elif isinstance(raw_value, float) and raw_value.is_integer():
+        parsed = int(raw_value)
+    elif isinstance(raw_value, str):
+        value = raw_value.strip()
+        if not value:
+            return None
+        try:
+            parsed = int(value)
+        except ValueError:
+            return None
+
+    if parsed is None:
+        return None
+
+    if parsed < 1 or parsed > 7:
+        raise ValueError("timer_id must be between 1 and 7.")
+
+    return parsed
+
+
+def _resolve_timer_args(operation: str, resolved_args: list[Any]) -> tuple[int, tuple[Any, ...]]:
+    default_timer_id = 1
+
+    if operation == "get":
+        if not resolved_args:
+            return default_timer_id, ()
+
+        parsed_timer_id = _parse_timer_id(resolved_args[0])
+        return parsed_timer_id if parsed_timer_id is not None else default_timer_id, ()
+
+    if not resolved_args:
+        return default_timer_id, ()
+
+    parsed_timer_id = _parse_timer_id(resolved_args[0])
+    if parsed_timer_id is None:
+        return default_timer_id, tuple(resolved_args)
+
+    return parsed_timer_id, tuple(resolved_args[1:])
+
+
+def _serialize_mdc_value(value: Any) -> Any:
+    if isinstance(value, Enum):
+        return value.name
+
+    if isinstance(value, datetime):
+        return value.isoformat()
+
+    if isinstance(value, dt_time):
+        if value.second == 0 and value.microsecond == 0:
+            return value.strftime("%H:%M")
+        return value.strftime("%H:%M:%S")
+
+    if isinstance(value, bytes):
+        return value.hex()
+
+    if isinstance(value, tuple):
+        return [_serialize_mdc_value(item) for item in value]
+
+    if isinstance(value, list):
+        return [_serialize_mdc_value(item) for item in value]
+
+    if isinstance(value, dict):
+        return {str(key): _serialize_mdc_value(item) for key, item in value.items()}
+
+    return value
+
+
+async def _tcp_port_open(ip: str, port: int, timeout: float) -> bool:
+    try:
+        connect_coro = asyncio.open_connection(ip, port)
+        _reader, writer = await asyncio.wait_for(connect_coro, timeout=timeout)
+        writer.close()
+        await writer.wait_closed()
+        return True
+    except Exception:
+        return False
+
+
+# Smoothed round-trip estimate per display, same scheme as TCP's RTO (RFC 6298).
+class _DisplayRtt:
+    __slots__ = ("srtt", "rttvar", "backoff", "samples")
+
+    def __init__(self) -> None:
+        self.srtt: float | None = None
+        self.rttvar = 0.0
+        self.backoff = 1.0
+        self.samples = 0
+
+    def observe(self, seconds: float) -> None:
+        if self.srtt is None:
+            self.srtt = seconds
+            self.rttvar = seconds / 2
+        else:
+            self.rttvar = 0.75 * self.rttvar + 0.25 * abs(self.srtt - seconds)
+            self.srtt = 0.875 * self.srtt + 0.125 * seconds
+        self.backoff = 1.0
+        self.samples += 1
+
+    def observe_timeout(self) -> None:
+        # Back off so a display that got slower can still be measured again.
+        self.backoff = min(self.backoff * 2, 64.0)
+
+    def timeout(self, fallback: float) -> float:
+        base = fallback if self.srtt is None else self.srtt + 4 * self.rttvar
+        bounded = base * self.backoff
+        return min(max(bounded, ADAPTIVE_TIMEOUT_MIN_SECONDS), ADAPTIVE_TIMEOUT_MAX_SECONDS)
+
+
+_display_rtt: dict[tuple[str, int, int, bool], _DisplayRtt] = {}
+
+
+def _display_rtt_for(ip: str, port: int, display_id: int, in_session: bool = False) -> _DisplayRtt:
+    # Commands on an already open session skip the connect, so they are timed
+    # separately; mixing them in would make the next cold connect time out early.
+    key = (ip, port, display_id, in_session)
+    estimator = _display_rtt.get(key)
+    if estimator is None:
+        estimator = _display_rtt[key] = _DisplayRtt()
+    return estimator
+
+
+class _DisplayHealth:
+    __slots__ = ("online", "deep_checked_at")
+
+    def __init__(self) -> None:
+        self.online: bool | None = None
+        self.deep_checked_at = 0.0
+
+
+_display_health: dict[tuple[str, int, int], _DisplayHealth] = {}
+
+
+_mdc_channels: dict[tuple[str, int], asyncio.Lock] = {}
+
+
+def _mdc_channel(ip: str, port: int) -> asyncio.Lock:
+    # Daisy-chained displays share one ip:port (one RS-232 line); only one session
+    # may talk on it at a time, so every MDC session holds its channel lock.
+    key = (ip, port)
+    channel = _mdc_channels.get(key)
+    if channel is None:
+        channel = _mdc_channels[key] = asyncio.Lock()
+    return channel
+
+
+async def _send_mdc_broadcast(mdc: Any, command_obj: Any, data: tuple[Any, ...]) -> None:
+    # No display answers a broadcast frame, so write it without waiting for a reply.
+    cmd = (command_obj.CMD, command_obj.SUBCMD) if command_obj.SUBCMD is not None else command_obj.CMD
+    frame = pack_payload(cmd, MDC_BROADCAST_DISPLAY_ID, command_obj.pack_payload_data(data) if data else [])
+    mdc.writer.write(frame)
+    await asyncio.wait_for(mdc.writer.drain(), timeout=CONNECTION_TEST_TIMEOUT_SECONDS)
+
+
+async def _call_with_adaptive_timeout(
+    estimator: _DisplayRtt,
+    call: Callable[[], Awaitable[Any]],
+    fallback_timeout: float | None,
+    retry: bool = False,
+) -> Any:
+    # fallback_timeout=None only measures the call; retry is for idempotent GETs only.
+    # A retried GET runs once more after the first attempt has ended, on a fresh
+    # session and with a timeout of its own, so a line never carries two sessions.
+    attempts = 2 if retry and MDC_GET_RETRY_ENABLED else 1
+    for attempt in range(attempts):
+        started = time.monotonic()
+        try:
+            if fallback_timeout is None:
+                result = await call()
+            else:
+                result = await asyncio.wait_for(call(), timeout=estimator.timeout(fallback_timeout))
+        except asyncio.TimeoutError:
+            estimator.observe_timeout()
+            if attempt + 1 == attempts:
+                raise
+        except Exception:
+            if attempt + 1 == attempts:
+                raise
+        else:
+            estimator.observe(time.monotonic() - started)
+            return result
+
+
+@router.get("/api/probe/{ip}")
+async def auto_probe_ports(
+    ip: str,
+    display_id: int = 0,
+    timeout: float | None = None,
+) -> dict[str, Any]:
+    if display_id < 0 or display_id > 255:
+        raise HTTPException(status_code=400, detail="Invalid display_id. Use 0-255.")
+
+    if timeout is not None and (timeout < 0.2 or timeout > 20):
+        raise HTTPException(status_code=400, detail="Invalid timeout. Use 0.2-20 seconds.")
+
+    candidates: list[tuple[int, str]] = [
+        (1515, "SIGNAGE_MDC"),
+    ]
+
+    attempts: list[dict[str, Any]] = []
+    found_port: int | None = None
+    found_protocol: str | None = None
+
+    for port, protocol in candidates:
+        # An explicit timeout is honoured as-is; otherwise it follows the display's RTT history.
+        estimator = _display_rtt_for(ip, port, display_id)
+        port_timeout = timeout if timeout is not None else estimator.timeout(PROBE_DEFAULT_TIMEOUT_SECONDS)
+        tcp_open = await _tcp_port_open(ip, port, timeout=port_timeout)
+        if not tcp_open:
+            attempts.append({
+                "port": port,
+                "protocol": protocol,
+                "success": False,
+                "verified": False,
+                "error": "TCP port closed",
+            })
+            continue
+
+        try:
+            async def _probe_mdc() -> None:
+                async with MDC(f"{ip}:{port}") as mdc:
+                    await mdc.status(display_id)
+
+            async with _mdc_channel(ip, port):
+                if timeout is None:
+                    await _call_with_adaptive_timeout(
+                        estimator,
+                        _probe_mdc,
+                        fallback_timeout=PROBE_DEFAULT_TIMEOUT_SECONDS,
+                        retry=True,
+                    )
+                else:
+                    await asyncio.wait_for(_probe_mdc(), timeout=timeout)
+
+            attempts.append({
+                "port": port,
+                "protocol": protocol,
+                "success": True,
+                "verified": True,
+                "error": None,
+            })
+            found_port = port
+            found_protocol = protocol
+            break
+        except Exception as exc:
+            attempts.append({
+                "port": port,
+                "protocol": protocol,
+                "success": True,
+                "verified": False,
+                "error": f"TCP open; protocol verification failed: {exc}",
+            })
+            found_port = port
+            found_protocol = protocol
+            break
+
+    if found_port is None or found_protocol is None:
+        return {
+            "status": "not_found",
+            "found": False,
+            "tv": ip,
+            "display_id": display_id,
+            "attempts": attempts,
+        }
+
+    verified = any(
+        item.get("port") == found_port and item.get("success") and item.get("verified")
+        for item in attempts
+    )
+
+    return {
+        "status": "success",
+        "found": True,
+        "verified": verified,
+        "tv": ip,
+        "display_id": display_id,
+        "port": found_port,
+        "protocol": found_protocol,
+        "attempts": attempts,
+    }
+
+
+async def _execute_on_chain(
+    payload: MdcExecuteRequest,
+    selected_protocol: str,
+    command_name: str,
+    operation: str,
+    run_on_session: Callable[[Any, int], Awaitable[Any]],
+) -> dict[str, Any]:
+    # Displays on one chain answer one at a time anyway; a single session avoids
+    # reconnecting for each of them.
+    is_get = operation == "get"
+    results: list[dict[str, Any]] = []
+    try:
+        async with _mdc_channel(payload.ip, payload.port):
+            async with MDC(f"{payload.ip}:{payload.port}") as mdc:
+                for display_id in payload.display_ids:
+                    try:
+                        result = await _call_with_adaptive_timeout(
+                            _display_rtt_for(payload.ip, payload.port, display_id, in_session=True),
+                            partial(run_on_session, mdc, display_id),
+                            fallback_timeout=CONNECTION_TEST_TIMEOUT_SECONDS if is_get else None,
+                        )
+                    except Exception as exc:
+                        results.append({"display_id": display_id, "status": "error", "error": str(exc)})
+                        # A late reply would be read as the next display's; start a fresh session.
+                        if mdc.is_opened:
+                            await mdc.close()
+                        continue
+
+                    serialized_result = _serialize_mdc_value(result)
+                    results.append(
+                        {
+                            "display_id": display_id,
+                            "status": "success",
+                            "result": str(result),
+                            "result_values": (
+                                serialized_result if isinstance(serialized_result, list) else [serialized_result]
+                            ),
+                        }
+                    )
+    except Exception as exc:
+        raise HTTPException(status_code=502, detail=f"Failed to execute MDC command: {exc}") from exc
+
+    failed = sum(1 for item in results if item["status"] == "error")
+    return {
+        "status": "success" if not failed else "partial",
+        "tv": payload.ip,
+        "port": payload.port,
+        "protocol": selected_protocol,
+        "command": command_name,
+        "operation": operation,
+        "args": payload.args,
+        "display_ids": payload.display_ids,
+        "failed": failed,
+        "results": results,
+    }
+
+
+def _is_mdc_read(payload: MdcExecuteRequest) -> bool:
+    # Same rule as _execute_mdc_command uses to resolve "auto".
+    operation = payload.operation.strip().lower()
+    if operation == "auto":
+        command_obj = MDC._commands.get(payload.command.strip())
+        return not payload.args and bool(getattr(command_obj, "GET", False))
+    return operation == "get"
+
+
+@router.post("/api/mdc/execute")
+async def execute_mdc_command(payload: MdcExecuteRequest) -> dict[str, Any]:
+    # Only commands that change a display are audited; reads such as the agent's
+    # periodic status monitor would otherwise bury operator actions.
+    if _is_mdc_read(payload):
+        return await _execute_mdc_command(payload)
+
+    audit = {
+        "action": "mdc_execute",
+        "command": payload.command.strip(),
+        "detail": {"operation": payload.operation.strip().lower(), "args": payload.args},
+    }
+    try:
+        response = await _execute_mdc_command(payload)
+    except HTTPException as exc:
+        for display_id in payload.display_ids or [payload.display_id]:
+            _audit.record(
+                {
+                    **audit,
+                    "device": f"{payload.ip}:{payload.port}:{display_id}",
+                    "status": "error",
+                    "error": str(exc.detail),
+                }
+            )
+        raise
+
+    audit["detail"]["operation"] = response["operation"]
+    for item in response.get("results") or [response]:
+        _audit.record(
+            {
+                **audit,
+                "device": f"{payload.ip}:{payload.port}:{item['display_id']}",
+                "status": item["status"],
+                "error": item.get("error"),
+            }
+        )
+    return response
+
+
+async def _execute_mdc_command(payload: MdcExecuteRequest) -> dict[str, Any]:
+    selected_protocol = resolve_protocol(payload.protocol, payload.port)
+    if selected_protocol != "SIGNAGE_MDC":
+        raise HTTPException(status_code=400, detail="MDC execute endpoint requires SIGNAGE_MDC protocol.")
+
+    command_name = payload.command.strip()
+    if command_name not in MDC._commands:
+        raise HTTPException(status_code=400, detail="Unknown MDC command.")
+
+    command_obj = MDC._commands[command_name]
+    operation = payload.operation.strip().lower()
+    if operation not in {"auto", "get", "set"}:
+        raise HTTPException(status_code=400, detail="Invalid operation. Use auto, get, or set.")
+
+    supports_get = bool(getattr(command_obj, "GET", False))
+    supports_set = bool(getattr(command_obj, "SET", False))
+
+    if operation == "auto":
+        operation = "get" if (supports_get and not payload.args) else "set"
+
+    if operation == "get" and not supports_get:
+        raise HTTPException(status_code=400, detail=f"{command_name} does not support GET.")
+
+    if operation == "set" and not supports_set:
+        raise HTTPException(status_code=400, detail=f"{command_name} does not support SET.")
+
+    try:
+        resolved_args = _coerce_command_args(
+            command_name=command_name,
+            command_obj=command_obj,
+            operation=operation,
+            raw_args=payload.args,
+        )
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+
+    timer_payload: tuple[int, tuple[Any, ...]] | None = None
+    if command_name in {"timer_13", "timer_15"}:
+        try:
+            timer_payload = _resolve_timer_args(operation, resolved_args)
+        except ValueError as exc:
+            raise HTTPException(status_code=400, detail=str(exc)) from exc
+
+    target = f"{payload.ip}:{payload.port}"
+    is_get = operation == "get"
+
+    async def _run_on_session(mdc: Any, display_id: int) -> Any:
+        method = getattr(mdc, command_name)
+
+        if timer_payload is not None:
+            timer_id, timer_data = timer_payload
+            if operation == "get":
+                return await method(display_id, timer_id, ())
+            return await method(display_id, timer_id, timer_data)
+
+        if operation == "get":
+            return await method(display_id)
+
+        return await method(display_id, tuple(resolved_args))
+
+    if payload.display_id == MDC_BROADCAST_DISPLAY_ID:
+        if is_get or timer_payload is not None:
+            raise HTTPException(
+                status_code=400,
+                detail="Broadcast display_id 254 only supports SET commands without per-display replies.",
+            )
+
+        try:
+            async with _mdc_channel(payload.ip, payload.port):
+                async with MDC(target) as mdc:
+                    await _send_mdc_broadcast(mdc, command_obj, tuple(resolved_args))
+        except Exception as exc:
+            raise HTTPException(status_code=502, detail=f"Failed to broadcast MDC command: {exc}") from exc
+
+        return {
+            "status": "success",
+            "tv": payload.ip,
+            "display_id": MDC_BROADCAST_DISPLAY_ID,
+            "port": payload.port,
+            "protocol": selected_protocol,
+            "command": command_name,
+            "operation": operation,
+            "args": payload.args,
+            "broadcast": True,
+        }
+
+    if payload.display_ids:
+        if any(item < 0 or item > 253 for item in payload.display_ids):
+            raise HTTPException(status_code=400, detail="Invalid display_ids. Use 0-253.")
+
+        return await _execute_on_chain(
+            payload,
+            selected_protocol,
+            command_name,
+            operation,
+            _run_on_session,
+        )
+
+    async def _execute_for_display_id(display_id: int) -> Any:
+        async def _run_command() -> Any:
+            async with MDC(target) as mdc:
+                return await _run_on_session(mdc, display_id)
+
+        # GETs are bounded and may be retried; SETs are only measured, never cut short.
+        return await _call_with_adaptive_timeout(
+            _display_rtt_for(payload.ip, payload.port, display_id),
+            _run_command,
+            fallback_timeout=CONNECTION_TEST_TIMEOUT_SECONDS if is_get else None,
+            retry=is_get,
+        )
+
+    candidate_display_ids: list[int] = []
+    for candidate in [payload.display_id, 0, 1]:
+        if candidate not in candidate_display_ids:
+            candidate_display_ids.append(candidate)
+
+    last_exc: Exception | None = None
+    used_display_id = payload.display_id
+    result: Any = None
+
+    async with _mdc_channel(payload.ip, payload.port):
+        for idx, candidate_display_id in enumerate(candidate_display_ids):
+            try:
+                result = await _execute_for_display_id(candidate_display_id)
+                used_display_id = candidate_display_id
+                break
+            except Exception as exc:
+                last_exc = exc
+
+                is_first_try = idx == 0
+                if is_first_try and not _is_nak_error_code_1(exc):
+                    raise HTTPException(status_code=502, detail=f"Failed to execute MDC command: {exc}") from exc
+
+                if not _is_nak_error_code_1(exc):
+                    continue
+        else:
+            assert last_exc is not None
+            raise HTTPException(status_code=502, detail=f"Failed to execute MDC command: {last_exc}") from last_exc
+
+    serialized_result = _serialize_mdc_value(result)
+    result_values = serialized_result if isinstance(serialized_result, list) else [serialized_result]
+
+    return {
+        "status": "success",
+        "tv": payload.ip,
+        "display_id": used_display_id,
+        "port": payload.port,
+        "protocol": selected_protocol,
+        "command": command_name,
+        "operation": operation,
+        "args": payload.args,
+        "result": str(result),
+        "result_values": result_values,
+    }
+
+
+# Settings that one `status` GET already returns, by position in its reply.
+_STATUS_FIELD_INDEX = {"power": 0, "volume": 1, "mute": 2, "input_source": 3}
+
+
+def _comparable_enum_value(value: Any, enum_obj: Any) -> Any:
+    if isinstance(value, Enum):
+        return int(value.value)
+
+    if isinstance(value, str) and enum_obj:
+        token = value.strip().upper()
+        for member in enum_obj:
+            if member.name.upper() == token:
+                return int(member.value)
+        try:
+            return int(token)
+        except ValueError:
+            return token
+
+    return value
+
+
+def _comparable_mdc_value(value: Any, field: Any) -> Any:
+    # Desired args arrive as names/strings, replies as enum members; compare on raw values.
+    field_type = type(field).__name__.lower()
+    enum_obj = getattr(field, "enum", None)
+
+    if field_type == "bitmask":
+        items = value if isinstance(value, (list, tuple, set)) else [value]
+        return tuple(sorted(_comparable_enum_value(item, enum_obj) for item in items))
+
+    if enum_obj:
+        return _comparable_enum_value(value, enum_obj)
+
+    if field_type == "bool":
+        if isinstance(value, str):
+            return value.strip().lower() in {"1", "true", "yes", "on"}
+        return bool(value)
+
+    if field_type == "int":
+        try:
+            return int(value)
+        except (TypeError, ValueError):
+            return value
+
+    return value
+
+
+def _plan_mdc_settings(desired: list[DesiredMdcSetting]) -> list[dict[str, Any]]:
+    planned: list[dict[str, Any]] = []
+    seen: set[tuple[str, int | None]] = set()
+    for setting in desired:
+        command_name = setting.command.strip()
+        command_obj = MDC._commands.get(command_name)
+        if command_obj is None:
+            raise HTTPException(status_code=400, detail=f"Unknown MDC command: {command_name}.")
+
+        if not (getattr(command_obj, "GET", False) and getattr(command_obj, "SET", False)):
+            raise HTTPException(
+                status_code=400,
+                detail=f"{command_name} must support both GET and SET to be reconciled.",
+            )
+
+        try:
+            values = _coerce_command_args(command_name, command_obj, "set", setting.args)
+            timer_id: int | None = None
+            if command_name in {"timer_13", "timer_15"}:
+                timer_id, timer_data = _resolve_timer_args("set", values)
+                values = list(timer_data)
+        except ValueError as exc:
+            raise HTTPException(status_code=400, detail=str(exc)) from exc
+
+        if (command_name, timer_id) in seen:
+            raise HTTPException(status_code=400, detail=f"{command_name} is listed more than once.")
+        seen.add((command_name, timer_id))
+
+        planned.append(
+            {
+                "command": command_name,
+                "timer_id": timer_id,
+                "values": values,
+                "fields": list(getattr(command_obj, "DATA", [])),
+            }
+        )
+
+    # Power first, so a display being switched on accepts the settings after it.
+    return sorted(planned, key=lambda item: item["command"] != "power")
+
+
+async def _read_mdc_settings(
+    mdc: Any,
+    estimator: _DisplayRtt,
+    display_id: int,
+    settings: list[dict[str, Any]],
+) -> list[tuple[Any, ...]]:
+    # One session, one GET per setting, except that `status` covers power/volume/mute/input.
+    status_reply: tuple[Any, ...] | None = None
+    if sum(1 for item in settings if item["command"] in _STATUS_FIELD_INDEX) > 1:
+        status_reply = await _call_with_adaptive_timeout(
+            estimator,
+            partial(mdc.status, display_id),
+            fallback_timeout=CONNECTION_TEST_TIMEOUT_SECONDS,
+        )
+
+    current: list[tuple[Any, ...]] = []
+    for item in settings:
+        if status_reply is not None and item["command"] in _STATUS_FIELD_INDEX:
+            current.append((status_reply[_STATUS_FIELD_INDEX[item["command"]]],))
+            continue
+
+        method = getattr(mdc, item["command"])
+        call = (
+            partial(method, display_id, item["timer_id"], ())
+            if item["timer_id"] is not None
+            else partial(method, display_id)
+        )
+        current.append(
+            await _call_with_adaptive_timeout(
+                estimator,
+                call,
+                fallback_timeout=CONNECTION_TEST_TIMEOUT_SECONDS,
+            )
+        )
+    return current
+
+
+async def _reconcile_display(
+    mdc: Any,
+    target: MdcReconcileTarget,
+    settings: list[dict[str, Any]],
+    dry_run: bool,
+) -> dict[str, Any]:
+    report: dict[str, Any] = {
+        "tv": target.ip,
+        "port": target.port,
+        "display_id": target.display_id,
+        "status": "in_sync",
+        "drift": [],
+        "applied": [],
+        "error": None,
+    }
+    estimator = _display_rtt_for(target.ip, target.port, target.display_id, in_session=True)
+
+    try:
+        current = await _read_mdc_settings(mdc, estimator, target.display_id, settings)
+
+        drifted: list[dict[str, Any]] = []
+        for item, current_values in zip(settings, current):
+            fields = item["fields"]
+            wanted = [_comparable_mdc_value(v, f) for v, f in zip(item["values"], fields)]
+            actual = [_comparable_mdc_value(v, f) for v, f in zip(current_values, fields)]
+            if wanted == actual[: len(wanted)]:
+                continue
+
+            drifted.append(item)
+            report["drift"].append(
+                {
+                    "command": item["command"],
+                    "timer_id": item["timer_id"],
+                    "current": _serialize_mdc_value(list(current_values[: len(wanted)])),
+                    "desired": _serialize_mdc_value(item["values"]),
+                }
+            )
+
+        if not drifted:
+            return report
+
+        report["status"] = "drifted" if dry_run else "reconciled"
+        if dry_run:
+            return report
+
+        for item in drifted:
+            method = getattr(mdc, item["command"])
+            call = (
+                partial(method, target.display_id, item["timer_id"], tuple(item["values"]))
+                if item["timer_id"] is not None
+                else partial(method, target.display_id, tuple(item["values"]))
+            )
+            applied = {"command": item["command"], "timer_id": item["timer_id"], "ok": True, "error": None}
+            try:
+                await _call_with_adaptive_timeout(estimator, call, fallback_timeout=None)
+            except Exception as exc:
+                applied.update(ok=False, error=str(exc))
+                report["status"] = "error"
+            report["applied"].append(applied)
+    except Exception as exc:
+        report["status"] = "error"
+        report["error"] = str(exc)
+        # Drop the session so the next display on this chain does not read a late reply.
+        if mdc.is_opened:
+            await mdc.close()
+
+    return report
+
+
+async def _reconcile_channel(
+    targets: list[MdcReconcileTarget],
+    settings: list[dict[str, Any]],
+    dry_run: bool,
+) -> list[dict[str, Any]]:
+    # Displays sharing ip:port are one daisy chain: handled in turn over one session.
+    ip, port = targets[0].ip, targets[0].port
+    async with _mdc_channel(ip, port):
+        async with MDC(f"{ip}:{port}") as mdc:
+            return [await _reconcile_display(mdc, target, settings, dry_run) for target in targets]
+
+
+@router.post("/api/mdc/reconcile")
+async def reconcile_mdc_settings(payload: MdcReconcileRequest) -> dict[str, Any]:
+    settings = _plan_mdc_settings(payload.desired)
+    semaphore = asyncio.Semaphore(payload.concurrency)
+
+    channels: dict[tuple[str, int], list[MdcReconcileTarget]] = {}
+    for target in payload.targets:
+        channels.setdefault((target.ip, target.port), []).append(target)
+
+    async def _bounded(targets: list[MdcReconcileTarget]) -> list[dict[str, Any]]:
+        async with semaphore:
+            try:
+                return await _reconcile_channel(targets, settings, payload.dry_run)
+            except Exception as exc:
+                return [
+                    {
+                        "tv": target.ip,
+                        "port": target.port,
+                        "display_id": target.display_id,
+                        "status": "error",
+                        "drift": [],
+                        "applied": [],
+                        "error": str(exc),
+                    }
+                    for target in targets
+                ]
+
+    grouped = await asyncio.gather(*(_bounded(targets) for targets in channels.values()))
+    results = [report for reports in grouped for report in reports]
+
+    # One entry per SET sent; drift and applied line up, as only drifted settings are set.
+    for item in results:
+        for drift, applied in zip(item["drift"], item["applied"]):
+            _audit.record(
+                {
+                    "action": "mdc_reconcile",
+                    "command": applied["command"],
+                    "device": f"{item['tv']}:{item['port']}:{item['display_id']}",
+                    "status": "success" if applied["ok"] else "error",
+                    "error": applied["error"],
+                    "detail": {
+                        "timer_id": applied["timer_id"],
+                        "previous": drift["current"],
+                        "desired": drift["desired"],
+                    },
+                }
+            )
+
+    counts = {"in_sync": 0, "drifted": 0, "reconciled": 0, "error": 0}
+    for item in results:
+        counts[item["status"]] += 1
+
+    return {
+        "status": "success",
+        "dry_run": payload.dry_run,
+        "total": len(results),
+        **counts,
+        "sets_sent": sum(len(item["applied"]) for item in results),
+        "results": results,
+    }
+
+
+_TIMER_VARIANTS = ("timer_15", "timer_13")
+
+
+def _plan_timer_writes(
+    timers: list[MdcTimerSetting],
+    variants: tuple[str, ...],
+) -> dict[str, list[tuple[int, tuple[Any, ...]]]]:
+    # Coerced per variant up front: with auto the display decides which one applies.
+    if len({item.timer_id for item in timers}) != len(timers):
+        raise HTTPException(status_code=400, detail="Each timer_id may be listed only once.")
+
+    planned: dict[str, list[tuple[int, tuple[Any, ...]]]] = {}
+    errors: list[str] = []
+    for variant in variants:
+        command_obj = MDC._commands[variant]
+        field_count = len(getattr(command_obj, "DATA", []))
+        writes: list[tuple[int, tuple[Any, ...]]] = []
+        try:
+            for item in sorted(timers, key=lambda setting: setting.timer_id):
+                if len(item.args) != field_count:
+                    raise ValueError(f"{variant} expects {field_count} values per timer.")
+                values = _coerce_command_args(variant, command_obj, "set", [item.timer_id, *item.args])
+                timer_id, timer_data = _resolve_timer_args("set", values)
+                writes.append((timer_id, timer_data))
+        except ValueError as exc:
+            errors.append(str(exc))
+            continue
+        planned[variant] = writes
+
+    if not planned:
+        raise HTTPException(status_code=400, detail=" ".join(errors))
+    return planned
+
+
+def _timer_schedule_entry(variant: str, timer_id: int, reply: tuple[Any, ...]) -> dict[str, Any]:
+    fields = getattr(MDC._commands[variant], "DATA", [])
+    entry: dict[str, Any] = {"timer_id": timer_id}
+    for field, value in zip(fields, reply):
+        entry[getattr(field, "name", "value").lower()] = _serialize_mdc_value(value)
+    return entry
+
+
+async def _read_timer(mdc: Any, estimator: _DisplayRtt, variant: str, display_id: int, timer_id: int) -> Any:
+    return await _call_with_adaptive_timeout(
+        estimator,
+        partial(getattr(mdc, variant), display_id, timer_id, ()),
+        fallback_timeout=CONNECTION_TEST_TIMEOUT_SECONDS,
+    )
+
+
+async def _sync_display_timers(
+    mdc: Any,
+    target: MdcReconcileTarget,
+    variant: str,
+    writes: dict[str, list[tuple[int, tuple[Any, ...]]]],
+) -> dict[str, Any]:
+    report: dict[str, Any] = {
+        "tv": target.ip,
+        "port": target.port,
+        "display_id": target.display_id,
+        "status": "success",
+        "variant": None,
+        "schedule": [],
+        "applied": [],
+        "error": None,
+    }
+    estimator = _display_rtt_for(target.ip, target.port, target.display_id, in_session=True)
+    replies: dict[int, Any] = {}
+
+    try:
+        if variant == "auto":
+            # The reply is read in full before the length check fails, so the session stays usable.
+            variant = "timer_15"
+            try:
+                replies[1] = await _read_timer(mdc, estimator, variant, target.display_id, 1)
+            except RuntimeError as exc:
+                if "timer_13" not in str(exc):
+                    raise
+                variant = "timer_13"
+        report["variant"] = variant
+    except Exception as exc:
+        report["status"] = "error"
+        report["error"] = str(exc)
+        if mdc.is_opened:
+            await mdc.close()
+        return report
+
+    if writes:
+        if variant not in writes:
+            report["status"] = "error"
+            report["error"] = f"Display uses {variant}; the timers given do not fit it."
+            return report
+
+        replies.clear()
+        for timer_id, timer_data in writes[variant]:
+            applied = {"timer_id": timer_id, "ok": True, "error": None}
+            try:
+                await _call_with_adaptive_timeout(
+                    estimator,
+                    partial(getattr(mdc, variant), target.display_id, timer_id, timer_data),
+                    fallback_timeout=None,
+                )
+            except Exception as exc:
+                applied.update(ok=False, error=str(exc))
+                report["status"] = "partial"
+                if mdc.is_opened:
+                    await mdc.close()
+            report["applied"].append(applied)
+
+    for timer_id in range(1, 8):
+        try:
+            reply = replies.get(timer_id)
+            if reply is None:
+                reply = await _read_timer(mdc, estimator, variant, target.display_id, timer_id)
+            report["schedule"].append(_timer_schedule_entry(variant, timer_id, reply))
+        except Exception as exc:
+            report["schedule"].append({"timer_id": timer_id, "error": str(exc)})
+            report["status"] = "partial"
+            # A late reply would be read as the next timer's; start a fresh session.
+            if mdc.is_opened:
+                await mdc.close()
+
+    if all("error" in item for item in report["schedule"]) and not any(
+        item["ok"] for item in report["applied"]
+    ):
+        report["status"] = "error"
+        report["error"] = report["schedule"][0]["error"]
+    return report
+
+
+async def _timers_channel(
+    targets: list[MdcReconcileTarget],
+    variant: str,
+    writes: dict[str, list[tuple[int, tuple[Any, ...]]]],
+) -> list[dict[str, Any]]:
+    ip, port = targets[0].ip, targets[0].port
+    async with _mdc_channel(ip, port):
+        async with MDC(f"{ip}:{port}") as mdc:
+            return [await _sync_display_timers(mdc, target, variant, writes) for target in targets]
+
+
+@router.post("/api/mdc/timers")
+async def sync_mdc_timers(payload: MdcTimersRequest) -> dict[str, Any]:
+    variant = payload.variant.strip().lower()
+    if variant not in {"auto", *_TIMER_VARIANTS}:
+        raise HTTPException(status_code=400, detail="Invalid variant. Use auto, timer_15, or timer_13.")
+
+    if any(target.display_id == MDC_BROADCAST_DISPLAY_ID for target in payload.targets):
+        raise HTTPException(
+            status_code=400,
+            detail="Timers are read per display; broadcast display_id 254 is not supported.",
+        )
+
+    writes: dict[str, list[tuple[int, tuple[Any, ...]]]] = {}
+    if payload.timers:
+        writes = _plan_timer_writes(payload.timers, _TIMER_VARIANTS if variant == "auto" else (variant,))
+
+    semaphore = asyncio.Semaphore(payload.concurrency)
+    channels: dict[tuple[str, int], list[MdcReconcileTarget]] = {}
+    for target in payload.targets:
+        channels.setdefault((target.ip, target.port), []).append(target)
+
+    async def _bounded(targets: list[MdcReconcileTarget]) -> list[dict[str, Any]]:
+        async with semaphore:
+            try:
+                return await _timers_channel(targets, variant, writes)
+            except Exception as exc:
+                return [
+                    {
+                        "tv": target.ip,
+                        "port": target.port,
+                        "display_id": target.display_id,
+                        "status": "error",
+                        "variant": None,
+                        "schedule": [],
+                        "applied": [],
+                        "error": str(exc),
+                    }
+                    for target in targets
+                ]
+
+    grouped = await asyncio.gather(*(_bounded(targets) for targets in channels.values()))
+    results = [report for reports in grouped for report in reports]
+
+    for item in results:
+        if not item["applied"]:
+            continue
+        _audit.record(
+            {
+                "action": "mdc_timers",
+                "command": item["variant"],
+                "device": f"{item['tv']}:{item['port']}:{item['display_id']}",
+                "status": "success" if all(applied["ok"] for applied in item["applied"]) else "error",
+                "error": item["error"] or next((a["error"] for a in item["applied"] if a["error"]), None),
+                "detail": {"timers": [applied["timer_id"] for applied in item["applied"]]},
+            }
+        )
+
+    return {
+        "status": "success",
+        "operation": "set" if payload.timers else "get",
+        "total": len(results),
+        "failed": sum(1 for item in results if item["status"] != "success"),
+        "results": results,
+    }
+
+
+@router.get("/api/tv/{ip}/{command}")
+async def control_tv(
+    ip: str,
+    command: str,
+    display_id: int = 0,
+    port: int = 1515,
+    protocol: str = "AUTO",
+) -> dict[str, str | int]:
+    audit = {"action": "tv_power", "command": command.lower(), "device": f"{ip}:{port}:{display_id}"}
+    try:
+        response = await _control_tv(ip, command, display_id, port, protocol)
+    except HTTPException as exc:
+        _audit.record({**audit, "status": "error", "error": str(exc.detail)})
+        raise
+
+    _audit.record({**audit, "status": "success"})
+    return response
+
+
+async def _control_tv(
+    ip: str,
+    command: str,
+    display_id: int,
+    port: int,
+    protocol: str,
+) -> dict[str, str | int]:
+    normalized = command.lower()
+    if normalized not in {"on", "off"}:
+        raise HTTPException(status_code=400, detail="Invalid command. Use 'on' or 'off'.")
+
+    if display_id < 0 or display_id > 255:
+        raise HTTPException(status_code=400, detail="Invalid display_id. Use 0-255.")
+
+    if port < 1 or port > 65535:
+        raise HTTPException(status_code=400, detail="Invalid port. Use 1-65535.")
+
+    selected_protocol = resolve_protocol(protocol, port)
+
+    try:
+        target = f"{ip}:{port}"
+        power_state = ("ON",) if normalized == "on" else ("OFF",)
+
+        async def _send_power() -> None:
+            async with MDC(target) as mdc:
+                if display_id == MDC_BROADCAST_DISPLAY_ID:
+                    await _send_mdc_broadcast(mdc, MDC._commands["power"], power_state)
+                else:
+                    await mdc.power(display_id, power_state)
+
+        async with _mdc_channel(ip, port):
+            await _call_with_adaptive_timeout(
+                _display_rtt_for(ip, port, display_id),
+                _send_power,
+                fallback_timeout=None,
+            )
+    except Exception as exc:
+        raise HTTPException(status_code=502, detail=f"Failed to send command: {exc}") from exc
+
+    response: dict[str, str | int] = {
+        "status": "success",
+        "tv": ip,
+        "command": normalized,
+        "display_id": display_id,
+        "port": port,
+        "protocol": selected_protocol,
+    }
+    return response
+
+
+@router.get("/api/test/{ip}")
+async def test_tv_connection(
+    ip: str,
+    display_id: int = 0,
+    port: int = 1515,
+    protocol: str = "AUTO",
+    tier: str | None = None,
+) -> dict[str, str | int | float | bool]:
+    if display_id < 0 or display_id > 255:
+        raise HTTPException(status_code=400, detail="Invalid display_id. Use 0-255.")
+
+    if port < 1 or port > 65535:
+        raise HTTPException(status_code=400, detail="Invalid port. Use 1-65535.")
+
+    selected_tier = (tier or HEALTH_CHECK_TIER).strip().lower()
+    if selected_tier not in {"fast", "deep", "auto"}:
+        raise HTTPException(status_code=400, detail="Invalid tier. Use fast, deep, or auto.")
+
+    selected_protocol = resolve_protocol(protocol, port)
+    history_key = f"{ip}:{port}:{display_id}"
+    health_key = (ip, port, display_id)
+    health = _display_health.get(health_key)
+    if health is None:
+        health = _display_health[health_key] = _DisplayHealth()
+
+    if selected_tier != "deep":
+        estimator = _display_rtt_for(ip, port, display_id)
+        timeout_seconds = estimator.timeout(PROBE_DEFAULT_TIMEOUT_SECONDS)
+        async with _mdc_channel(ip, port):
+            tcp_open = await _tcp_port_open(ip, port, timeout=timeout_seconds)
+
+        deep_due = selected_tier == "auto" and (
+            tcp_open != health.online
+            or time.time() - health.deep_checked_at >= HEALTH_DEEP_INTERVAL_SECONDS
+        )
+        if not deep_due:
+            health.online = tcp_open
+            _status_history.record(history_key, time.time(), tcp_open)
+            if not tcp_open:
+                raise HTTPException(
+                    status_code=502,
+                    detail={
+                        "message": "Connectivity test failed: TCP port closed or unreachable (fast check).",
+                        "tier": "fast",
+                    },
+                    headers={"X-Health-Tier": "fast"},
+                )
+            return {
+                "status": "success",
+                "reachable": True,
+                "tv": ip,
+                "display_id": display_id,
+                "port": port,
+                "protocol": selected_protocol,
+                "tier": "fast",
+                "timeout_seconds": round(timeout_seconds, 3),
+            }
+
+    try:
+        target = f"{ip}:{port}"
+
+        async def _probe_mdc() -> Any:
+            async with MDC(target) as mdc:
+                return await mdc.status(display_id)
+
+        estimator = _display_rtt_for(ip, port, display_id)
+        timeout_seconds = estimator.timeout(CONNECTION_TEST_TIMEOUT_SECONDS)
+        async with _mdc_channel(ip, port):
+            status_raw = await _call_with_adaptive_timeout(
+                estimator,
+                _probe_mdc,
+                fallback_timeout=CONNECTION_TEST_TIMEOUT_SECONDS,
+                retry=True,
+            )
+        health.online = True
+        health.deep_checked_at = time.time()
+        _status_history.record(history_key, time.time(), True)
+        return {
+            "status": "success",
+            "reachable": True,
+            "tv": ip,
+            "display_id": display_id,
+            "port": port,
+            "protocol": selected_protocol,
+            "tier": "deep",
+            "mdc_status": str(status_raw),
+            "timeout_seconds": round(timeout_seconds, 3),
+        }
+    except Exception as exc:
+        health.online = False
+        health.deep_checked_at = time.time()
+        _status_history.record(history_key, time.time(), False)
+        raise HTTPException(
+            status_code=502,
+            detail={"message": _connectivity_error_detail(selected_protocol, exc), "tier": "deep"},
+            headers={"X-Health-Tier": "deep"},
+        ) from exc
+
+
+async def _warm_up_mdc() -> None:
+    # Pay for the command catalog before the first request instead of during it.
+    command_catalog()
+
+
+_startup_hooks.append(_warm_up_mdc)
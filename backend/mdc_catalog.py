@@ -0,0 +1,60 @@
+from functools import lru_cache
+from typing import Any
+
+from fastapi import APIRouter
+
+from common import _CompactRoute
+
+router = APIRouter(route_class=_CompactRoute)
+
+
+def _command_fields(command_obj: Any) -> list[dict[str, Any]]:
+    fields: list[dict[str, Any]] = []
+    for field in getattr(command_obj, "DATA", []):
+        enum_obj = getattr(field, "enum", None)
+        range_obj = getattr(field, "range", None)
+        enum_values = [m.name for m in enum_obj] if enum_obj else []
+
+        range_payload = None
+        if isinstance(range_obj, range):
+            range_payload = {
+                "min": range_obj.start,
+                "max": range_obj.stop - 1,
+            }
+
+        fields.append(
+            {
+                "name": getattr(field, "name", "arg"),
+                "type": type(field).__name__,
+                "enum": enum_values,
+                "range": range_payload,
+            }
+        )
+
+    return fields
+
+
+@lru_cache(maxsize=1)
+def command_catalog() -> list[dict[str, Any]]:
+    # Built once per process, and samsung_mdc is only imported here when the
+    # cloud-only app is asked for the catalog.
+    from samsung_mdc import MDC
+
+    payload: list[dict[str, Any]] = []
+    for name in sorted(MDC._commands.keys()):
+        command_obj = MDC._commands[name]
+        payload.append(
+            {
+                "name": name,
+                "supports_get": bool(getattr(command_obj, "GET", False)),
+                "supports_set": bool(getattr(command_obj, "SET", False)),
+                "fields": _command_fields(command_obj),
+            }
+        )
+
+    return payload
+
+
+@router.get("/api/mdc/commands")
+async def list_mdc_commands() -> dict[str, list[dict[str, Any]]]:
+    return {"commands": command_catalog()}
@@ -1,8 +1,15 @@
+import gzip
+import json
+import math
 import os
 import socket
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
 from typing import Any
 
+import msgpack
 import requests
 
 CLOUD_BASE_URL = os.getenv("CLOUD_BASE_URL", "").strip().rstrip("/")
@@ -11,7 +18,17 @@ AGENT_SHARED_SECRET = os.getenv("AGENT_SHARED_SECRET", "").strip()
 LOCAL_BACKEND_URL = os.getenv("LOCAL_BACKEND_URL", "http://127.0.0.1:8000").strip().rstrip("/")
 AGENT_POLL_INTERVAL_SECONDS = float(os.getenv("AGENT_POLL_INTERVAL_SECONDS", "2"))
 AGENT_MAX_JOBS_PER_POLL = int(os.getenv("AGENT_MAX_JOBS_PER_POLL", "5"))
+AGENT_LONG_POLL_SECONDS = float(os.getenv("AGENT_LONG_POLL_SECONDS", "10"))
 REQUEST_TIMEOUT_SECONDS = float(os.getenv("AGENT_REQUEST_TIMEOUT_SECONDS", "20"))
+AGENT_BATCH_CONCURRENCY = int(os.getenv("AGENT_BATCH_CONCURRENCY", "8"))
+# Longest single MDC call on the local backend; keep equal to its ADAPTIVE_TIMEOUT_MAX_SECONDS.
+AGENT_MDC_CALL_TIMEOUT_SECONDS = float(os.getenv("AGENT_MDC_CALL_TIMEOUT_SECONDS", "8"))
+AGENT_WIRE_FORMAT = os.getenv("AGENT_WIRE_FORMAT", "json").strip().lower()
+AGENT_COMPRESS_MIN_BYTES = int(os.getenv("AGENT_COMPRESS_MIN_BYTES", "1024"))
+AGENT_MONITOR_TARGETS = os.getenv("AGENT_MONITOR_TARGETS", "").strip()
+AGENT_MONITOR_INTERVAL_SECONDS = float(os.getenv("AGENT_MONITOR_INTERVAL_SECONDS", "30"))
+
+MSGPACK_MEDIA_TYPE = "application/msgpack"
 
 
 class AgentConfigError(RuntimeError):
@@ -20,24 +37,102 @@ class AgentConfigError(RuntimeError):
 
 def _headers() -> dict[str, str]:
     headers: dict[str, str] = {"Content-Type": "application/json"}
+    if AGENT_WIRE_FORMAT == "msgpack":
+        headers["Content-Type"] = MSGPACK_MEDIA_TYPE
+        headers["Accept"] = MSGPACK_MEDIA_TYPE
     if AGENT_SHARED_SECRET:
         headers["x-agent-token"] = AGENT_SHARED_SECRET
     return headers
 
 
+def _encode_body(payload: dict[str, Any], headers: dict[str, str]) -> bytes:
+    if AGENT_WIRE_FORMAT == "msgpack":
+        body = msgpack.packb(payload)
+    else:
+        body = json.dumps(payload, separators=(",", ":")).encode()
+
+    if len(body) >= AGENT_COMPRESS_MIN_BYTES:
+        body = gzip.compress(body)
+        headers["Content-Encoding"] = "gzip"
+    return body
+
+
+def _response_payload(response: requests.Response) -> Any:
+    content_type = response.headers.get("content-type", "").lower()
+    if content_type.startswith(MSGPACK_MEDIA_TYPE):
+        return msgpack.unpackb(response.content)
+    return response.json()
+
+
 def _post(path: str, payload: dict[str, Any]) -> requests.Response:
+    headers = _headers()
+    body = _encode_body(payload, headers)
     return requests.post(
         f"{CLOUD_BASE_URL}{path}",
-        json=payload,
-        headers=_headers(),
+        data=body,
+        headers=headers,
         timeout=REQUEST_TIMEOUT_SECONDS,
     )
 
 
+def _mdc_job_timeout(payload: dict[str, Any], calls_per_display: int) -> float:
+    # The local backend answers only after every display is done. Displays sharing
+    # ip:port run one after another; chains run `concurrency` at a time.
+    targets = payload.get("targets") or []
+    chains: dict[tuple[str, int], int] = {}
+    for target in targets:
+        key = (str(target.get("ip", "")), int(target.get("port", 1515)))
+        chains[key] = chains.get(key, 0) + 1
+    if not chains:
+        return REQUEST_TIMEOUT_SECONDS
+
+    concurrency = max(1, int(payload.get("concurrency") or 8))
+    serial_displays = math.ceil(len(targets) / concurrency) + max(chains.values())
+    # One extra call per display covers the connect and a reconnect after a failed call.
+    worst_case = serial_displays * (calls_per_display + 1) * AGENT_MDC_CALL_TIMEOUT_SECONDS
+    return max(REQUEST_TIMEOUT_SECONDS, worst_case)
+
+
+def _execute_batch_job(payload: dict[str, Any]) -> dict[str, Any]:
+    target_kind = str(payload.get("kind", "")).strip().lower()
+    if not target_kind or target_kind == "batch":
+        raise ValueError("batch payload requires a non-batch kind")
+
+    targets = payload.get("targets") or []
+    if not targets:
+        raise ValueError("batch payload requires targets")
+
+    params = payload.get("params") or {}
+    requested = int(payload.get("concurrency") or AGENT_BATCH_CONCURRENCY)
+    workers = max(1, min(requested, AGENT_BATCH_CONCURRENCY, len(targets)))
+
+    def _run_target(target: dict[str, Any]) -> dict[str, Any]:
+        try:
+            result = _execute_local_job({"kind": target_kind, "payload": {**params, **target}})
+            return {"target": target, "ok": True, "result": result, "error": None}
+        except Exception as exc:
+            return {"target": target, "ok": False, "result": None, "error": str(exc)}
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        results = list(pool.map(_run_target, targets))
+
+    failed = sum(1 for item in results if not item["ok"])
+    return {
+        "kind": target_kind,
+        "total": len(results),
+        "succeeded": len(results) - failed,
+        "failed": failed,
+        "results": results,
+    }
+
+
 def _execute_local_job(job: dict[str, Any]) -> dict[str, Any]:
     kind = str(job.get("kind", "")).strip().lower()
     payload = job.get("payload") or {}
 
+    if kind == "batch":
+        return _execute_batch_job(payload)
+
     if kind == "tv":
         ip = str(payload.get("ip", "")).strip()
         command = str(payload.get("command", "")).strip().lower()
@@ -63,6 +158,8 @@ def _execute_local_job(job: dict[str, Any]) -> dict[str, Any]:
             "port": int(payload.get("port", 1515)),
             "protocol": payload.get("protocol", "AUTO"),
         }
+        if payload.get("tier"):
+            params["tier"] = str(payload["tier"])
         response = requests.get(
             f"{LOCAL_BACKEND_URL}/api/test/{ip}",
             params=params,
@@ -73,10 +170,10 @@ def _execute_local_job(job: dict[str, Any]) -> dict[str, Any]:
         ip = str(payload.get("ip", "")).strip()
         if not ip:
             raise ValueError("probe payload requires ip")
-        params = {
-            "display_id": int(payload.get("display_id", 0)),
-            "timeout": float(payload.get("timeout", 1.5)),
-        }
+        params: dict[str, Any] = {"display_id": int(payload.get("display_id", 0))}
+        # Without an explicit timeout the local backend adapts it to the display's RTT history.
+        if payload.get("timeout") is not None:
+            params["timeout"] = float(payload["timeout"])
         response = requests.get(
             f"{LOCAL_BACKEND_URL}/api/probe/{ip}",
             params=params,
@@ -90,6 +187,22 @@ def _execute_local_job(job: dict[str, Any]) -> dict[str, Any]:
             timeout=REQUEST_TIMEOUT_SECONDS,
         )
 
+    elif kind == "mdc_reconcile":
+        # Each desired setting is read, then set again if it drifted.
+        response = requests.post(
+            f"{LOCAL_BACKEND_URL}/api/mdc/reconcile",
+            json=payload,
+            timeout=_mdc_job_timeout(payload, 2 * len(payload.get("desired") or [])),
+        )
+
+    elif kind == "mdc_timers":
+        # A variant probe, each timer written, then all seven read back.
+        response = requests.post(
+            f"{LOCAL_BACKEND_URL}/api/mdc/timers",
+            json=payload,
+            timeout=_mdc_job_timeout(payload, 8 + len(payload.get("timers") or [])),
+        )
+
     elif kind == "local_http":
         method = str(payload.get("method", "GET")).strip().upper()
         path = str(payload.get("path", "/health")).strip()
@@ -121,11 +234,18 @@ def _execute_local_job(job: dict[str, Any]) -> dict[str, Any]:
     }
 
 
-def _submit_result(job_id: str, ok: bool, result: dict[str, Any] | None, error: str | None) -> None:
+def _submit_result(
+    job_id: str,
+    ok: bool,
+    result: dict[str, Any] | None,
+    error: str | None,
+    timings: dict[str, float] | None = None,
+) -> None:
     payload: dict[str, Any] = {
         "status": "success" if ok else "error",
         "result": result if ok else None,
         "error": error if not ok else None,
+        "timings": timings,
     }
     response = _post(f"/api/agent/{AGENT_ID}/jobs/{job_id}/result", payload)
     response.raise_for_status()
@@ -144,28 +264,116 @@ def _heartbeat() -> None:
 def _poll_once() -> int:
     response = _post(
         f"/api/agent/{AGENT_ID}/poll",
-        {"max_jobs": AGENT_MAX_JOBS_PER_POLL},
+        {"max_jobs": AGENT_MAX_JOBS_PER_POLL, "wait_seconds": AGENT_LONG_POLL_SECONDS},
     )
     response.raise_for_status()
-    payload = response.json()
+    payload = _response_payload(response)
     jobs = payload.get("jobs") or []
+    # Jobs from one poll run in order, so later ones also wait for earlier ones.
+    received = time.monotonic()
 
     for job in jobs:
         job_id = str(job.get("job_id", "")).strip()
         if not job_id:
             continue
 
+        started = time.monotonic()
         try:
             result = _execute_local_job(job)
-            _submit_result(job_id, ok=True, result=result, error=None)
-            print(f"[agent] completed job {job_id} ({job.get('kind')})")
+            ok, error = True, None
         except Exception as exc:
-            _submit_result(job_id, ok=False, result=None, error=str(exc))
-            print(f"[agent] failed job {job_id}: {exc}")
+            result, ok, error = None, False, str(exc)
+        finished = time.monotonic()
+
+        timings = {
+            "agent_wait_ms": round((started - received) * 1000, 3),
+            "execute_ms": round((finished - started) * 1000, 3),
+        }
+        _submit_result(job_id, ok=ok, result=result, error=error, timings=timings)
+        if ok:
+            print(f"[agent] completed job {job_id} ({job.get('kind')})")
+        else:
+            print(f"[agent] failed job {job_id}: {error}")
 
     return len(jobs)
 
 
+def _parse_monitor_targets(raw: str) -> list[dict[str, Any]]:
+    # Comma separated ip[:port[:display_id]] entries.
+    targets: list[dict[str, Any]] = []
+    for token in raw.split(","):
+        parts = token.strip().split(":")
+        if not parts[0]:
+            continue
+        port = int(parts[1]) if len(parts) > 1 and parts[1] else 1515
+        display_id = int(parts[2]) if len(parts) > 2 and parts[2] else 0
+        targets.append({"ip": parts[0], "port": port, "display_id": display_id})
+    return targets
+
+
+def _read_display_state(target: dict[str, Any]) -> dict[str, Any]:
+    try:
+        response = requests.post(
+            f"{LOCAL_BACKEND_URL}/api/mdc/execute",
+            json={**target, "command": "status", "operation": "get"},
+            timeout=REQUEST_TIMEOUT_SECONDS,
+        )
+        if response.status_code >= 400:
+            return {"online": False, "power": None, "input": None}
+        values = response.json().get("result_values") or []
+    except Exception:
+        return {"online": False, "power": None, "input": None}
+
+    # status -> POWER_STATE, VOLUME, MUTE_STATE, INPUT_SOURCE_STATE, ...
+    return {
+        "online": True,
+        "power": str(values[0]) if len(values) > 0 else None,
+        "input": str(values[3]) if len(values) > 3 else None,
+    }
+
+
+def _monitor_loop(targets: list[dict[str, Any]]) -> None:
+    known: dict[str, dict[str, Any]] = {}
+    send_full = True
+    workers = max(1, min(AGENT_BATCH_CONCURRENCY, len(targets)))
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        while True:
+            started = time.time()
+            try:
+                states = list(pool.map(_read_display_state, targets))
+                current = {
+                    f"{target['ip']}:{target['port']}:{target['display_id']}": state
+                    for target, state in zip(targets, states)
+                }
+                changed = [
+                    {"key": key, **state}
+                    for key, state in current.items()
+                    if send_full or known.get(key) != state
+                ]
+
+                # An empty report still tells the cloud every display was checked this cycle.
+                response = _post(
+                    f"/api/agent/{AGENT_ID}/status",
+                    {
+                        "full": send_full,
+                        "observed_at": datetime.now(timezone.utc).isoformat(),
+                        "deltas": changed,
+                    },
+                )
+                response.raise_for_status()
+                send_full = bool(_response_payload(response).get("resync"))
+                known = current
+                if changed:
+                    print(f"[agent] reported {len(changed)} status change(s)")
+            except Exception as exc:
+                send_full = True
+                print(f"[agent] monitor error: {exc}")
+
+            elapsed = time.time() - started
+            time.sleep(max(AGENT_MONITOR_INTERVAL_SECONDS - elapsed, 1))
+
+
 def _validate_config() -> None:
     missing: list[str] = []
     if not CLOUD_BASE_URL:
@@ -181,6 +389,11 @@ def main() -> None:
     _validate_config()
     print(f"[agent] starting: agent_id={AGENT_ID} cloud={CLOUD_BASE_URL} local={LOCAL_BACKEND_URL}")
 
+    monitor_targets = _parse_monitor_targets(AGENT_MONITOR_TARGETS)
+    if monitor_targets and AGENT_MONITOR_INTERVAL_SECONDS > 0:
+        threading.Thread(target=_monitor_loop, args=(monitor_targets,), daemon=True).start()
+        print(f"[agent] monitoring {len(monitor_targets)} display(s) every {AGENT_MONITOR_INTERVAL_SECONDS}s")
+
     last_heartbeat = 0.0
     while True:
         now = time.time()
@@ -189,9 +402,12 @@ def main() -> None:
                 _heartbeat()
                 last_heartbeat = now
 
+            poll_started = time.time()
             jobs_count = _poll_once()
-            if jobs_count == 0:
-                time.sleep(AGENT_POLL_INTERVAL_SECONDS)
+            # A long poll already waited; only pause if the cloud answered right away.
+            idle = AGENT_POLL_INTERVAL_SECONDS - (time.time() - poll_started)
+            if jobs_count == 0 and idle > 0:
+                time.sleep(idle)
         except Exception as exc:
             print(f"[agent] loop error: {exc}")
             time.sleep(max(AGENT_POLL_INTERVAL_SECONDS, 2))
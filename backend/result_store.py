@@ -0,0 +1,60 @@
+import os
+import zlib
+
+try:
+    import fcntl
+except ImportError:  # non-POSIX hosts run a single worker
+    fcntl = None
+
+
+class ResultSegmentStore:
+    # Large job results are zlib-compressed and appended to rotating segment files;
+    # the broker row only keeps a "segment:offset:length" reference to them.
+
+    def __init__(self, directory: str, segment_max_bytes: int, max_segments: int) -> None:
+        self.directory = directory
+        self.segment_max_bytes = segment_max_bytes
+        self.max_segments = max_segments
+
+    def _segments(self) -> list[str]:
+        try:
+            names = os.listdir(self.directory)
+        except FileNotFoundError:
+            return []
+        return sorted(name for name in names if name.endswith(".seg"))
+
+    def append(self, raw: bytes) -> str:
+        os.makedirs(self.directory, exist_ok=True)
+        payload = zlib.compress(raw)
+
+        # The lock file serializes appends and rotation across uvicorn workers.
+        with open(os.path.join(self.directory, ".append.lock"), "a") as lock:
+            if fcntl is not None:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+
+            segments = self._segments()
+            name = segments[-1] if segments else "00000000.seg"
+            path = os.path.join(self.directory, name)
+            if os.path.exists(path) and os.path.getsize(path) + len(payload) > self.segment_max_bytes:
+                name = f"{int(name[:-4]) + 1:08d}.seg"
+                path = os.path.join(self.directory, name)
+                segments.append(name)
+
+            with open(path, "ab") as handle:
+                offset = handle.seek(0, os.SEEK_END)
+                handle.write(payload)
+
+            for stale in segments[: max(len(segments) - self.max_segments, 0)]:
+                os.remove(os.path.join(self.directory, stale))
+
+        return f"{name}:{offset}:{len(payload)}"
+
+    def read(self, ref: str) -> bytes | None:
+        # None once the segment has been rotated out.
+        name, offset, length = ref.split(":")
+        try:
+            with open(os.path.join(self.directory, name), "rb") as handle:
+                handle.seek(int(offset))
+                return zlib.decompress(handle.read(int(length)))
+        except FileNotFoundError:
+            return None
@@ -0,0 +1,263 @@
+import os
+import struct
+from array import array
+from bisect import bisect_right
+from typing import Any, Iterator
+from urllib.parse import quote
+
+try:
+    import fcntl
+except ImportError:  # non-POSIX hosts always act as the single writer
+    fcntl = None
+
+OFFLINE = 0
+ONLINE = 1
+
+# One run of identical observed state: start, end (epoch seconds) and state.
+_RUN = struct.Struct("<ddb")
+
+
+class DisplayHistory:
+    # Raw samples land in a fixed ring buffer and are folded into runs on drain.
+    # Time between runs (monitoring gaps longer than max_gap) counts as unknown.
+
+    __slots__ = (
+        "max_gap",
+        "ring_ts",
+        "ring_state",
+        "ring_head",
+        "ring_size",
+        "run_start",
+        "run_end",
+        "run_state",
+        "dirty_from",
+    )
+
+    def __init__(self, ring_capacity: int, max_gap: float) -> None:
+        self.max_gap = max_gap
+        self.ring_ts = array("d", bytes(8 * ring_capacity))
+        self.ring_state = bytearray(ring_capacity)
+        self.ring_head = 0
+        self.ring_size = 0
+        self.run_start = array("d")
+        self.run_end = array("d")
+        self.run_state = array("b")
+        self.dirty_from = 0
+
+    def record(self, ts: float, online: bool) -> None:
+        capacity = len(self.ring_state)
+        if self.ring_size == capacity:
+            self.drain()
+
+        slot = (self.ring_head + self.ring_size) % capacity
+        self.ring_ts[slot] = ts
+        self.ring_state[slot] = ONLINE if online else OFFLINE
+        self.ring_size += 1
+
+    def drain(self) -> None:
+        capacity = len(self.ring_state)
+        for offset in range(self.ring_size):
+            slot = (self.ring_head + offset) % capacity
+            self._fold(self.ring_ts[slot], self.ring_state[slot])
+        self.ring_head = (self.ring_head + self.ring_size) % capacity
+        self.ring_size = 0
+
+    def _fold(self, ts: float, state: int) -> None:
+        count = len(self.run_state)
+        if count and ts < self.run_end[-1]:
+            return
+
+        contiguous = count and ts - self.run_end[-1] <= self.max_gap
+        if contiguous and self.run_state[-1] == state:
+            self.run_end[-1] = ts
+            self.dirty_from = min(self.dirty_from, count - 1)
+            return
+
+        if contiguous:
+            # The previous state held until this change was observed.
+            self.run_end[-1] = ts
+            self.dirty_from = min(self.dirty_from, count - 1)
+
+        self.run_start.append(ts)
+        self.run_end.append(ts)
+        self.run_state.append(state)
+        self.dirty_from = min(self.dirty_from, count)
+
+    def load(self, raw: bytes) -> None:
+        for start, end, state in _RUN.iter_unpack(raw[: len(raw) - len(raw) % _RUN.size]):
+            self.run_start.append(start)
+            self.run_end.append(end)
+            self.run_state.append(state)
+        self.dirty_from = len(self.run_state)
+
+    def dirty_runs(self) -> tuple[int, bytes]:
+        first = self.dirty_from
+        payload = b"".join(
+            _RUN.pack(self.run_start[idx], self.run_end[idx], self.run_state[idx])
+            for idx in range(first, len(self.run_state))
+        )
+        self.dirty_from = len(self.run_state)
+        return first, payload
+
+    def segments(self, start: float, end: float) -> Iterator[tuple[float, float, int]]:
+        self.drain()
+        idx = max(bisect_right(self.run_start, start) - 1, 0)
+        count = len(self.run_state)
+        while idx < count and self.run_start[idx] < end:
+            seg_start = max(self.run_start[idx], start)
+            seg_end = min(self.run_end[idx], end)
+            if seg_end > seg_start:
+                yield seg_start, seg_end, self.run_state[idx]
+            idx += 1
+
+
+class StatusHistoryStore:
+    def __init__(self, directory: str, ring_capacity: int = 64, max_gap: float = 300.0) -> None:
+        self.directory = directory
+        self.ring_capacity = ring_capacity
+        self.max_gap = max_gap
+        self._displays: dict[str, DisplayHistory] = {}
+        # Only one process may write the run files; the others read them from disk.
+        self.writer = True
+        self._writer_lock: Any = None
+
+    def claim_writer(self) -> bool:
+        if not self.directory or fcntl is None or self._writer_lock is not None:
+            self.writer = True
+            return True
+
+        os.makedirs(self.directory, exist_ok=True)
+        handle = open(os.path.join(self.directory, ".writer.lock"), "a")
+        try:
+            fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            handle.close()
+            self.writer = False
+            self._displays.clear()
+            return False
+
+        self._writer_lock = handle
+        self.writer = True
+        return True
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, quote(key, safe="") + ".runs")
+
+    def _load(self, key: str) -> DisplayHistory:
+        history = DisplayHistory(self.ring_capacity, self.max_gap)
+        if self.directory:
+            try:
+                with open(self._path(key), "rb") as handle:
+                    history.load(handle.read())
+            except FileNotFoundError:
+                pass
+        return history
+
+    def _history(self, key: str) -> DisplayHistory:
+        history = self._displays.get(key)
+        if history is None:
+            history = self._load(key)
+            if self.writer:
+                self._displays[key] = history
+        return history
+
+    def snapshot(self, key: str) -> DisplayHistory | None:
+        # A copy of the runs held in memory, safe to summarize off the event loop.
+        history = self._displays.get(key)
+        if history is None:
+            return None
+
+        history.drain()
+        copy = DisplayHistory(1, self.max_gap)
+        copy.run_start = array("d", history.run_start)
+        copy.run_end = array("d", history.run_end)
+        copy.run_state = array("b", history.run_state)
+        return copy
+
+    def record(self, key: str, ts: float, online: bool) -> None:
+        if self.writer:
+            self._history(key).record(ts, online)
+
+    def collect_dirty(self) -> list[tuple[str, int, bytes]]:
+        # Runs in memory; the returned writes can then be applied off the event loop.
+        writes: list[tuple[str, int, bytes]] = []
+        for key, history in self._displays.items():
+            history.drain()
+            first, payload = history.dirty_runs()
+            if payload:
+                writes.append((key, first * _RUN.size, payload))
+        return writes
+
+    def write(self, writes: list[tuple[str, int, bytes]]) -> None:
+        if not self.directory or not writes:
+            return
+
+        os.makedirs(self.directory, exist_ok=True)
+        for key, offset, payload in writes:
+            path = self._path(key)
+            mode = "r+b" if os.path.exists(path) else "wb"
+            with open(path, mode) as handle:
+                handle.seek(offset)
+                handle.write(payload)
+
+    def flush(self) -> int:
+        writes = self.collect_dirty()
+        self.write(writes)
+        return len(writes)
+
+    def summarize(
+        self,
+        key: str,
+        start: float,
+        end: float,
+        buckets: int,
+        history: DisplayHistory | None = None,
+    ) -> dict[str, Any]:
+        # Displays not held in memory are read from disk without being cached, so
+        # queries for arbitrary keys do not grow the store.
+        if history is None:
+            history = self._load(key)
+
+        window = end - start
+        bucket_width = window / buckets
+        bucket_online = [0.0] * buckets
+        bucket_covered = [0.0] * buckets
+        online_seconds = 0.0
+        covered_seconds = 0.0
+        outages: list[list[float]] = []
+
+        for seg_start, seg_end, state in history.segments(start, end):
+            covered_seconds += seg_end - seg_start
+            if state == ONLINE:
+                online_seconds += seg_end - seg_start
+            elif outages and outages[-1][1] == seg_start:
+                outages[-1][1] = seg_end
+            else:
+                outages.append([seg_start, seg_end])
+
+            first_bucket = min(int((seg_start - start) / bucket_width), buckets - 1)
+            for bucket in range(first_bucket, buckets):
+                bucket_start = start + bucket * bucket_width
+                if bucket_start >= seg_end:
+                    break
+                overlap = min(seg_end, bucket_start + bucket_width) - max(seg_start, bucket_start)
+                if overlap <= 0:
+                    continue
+                bucket_covered[bucket] += overlap
+                if state == ONLINE:
+                    bucket_online[bucket] += overlap
+
+        return {
+            "uptime_ratio": online_seconds / covered_seconds if covered_seconds else None,
+            "coverage_ratio": covered_seconds / window,
+            "online_seconds": online_seconds,
+            "covered_seconds": covered_seconds,
+            "outages": [(outage_start, outage_end) for outage_start, outage_end in outages],
+            "timeline": [
+                (
+                    start + bucket * bucket_width,
+                    bucket_online[bucket] / bucket_covered[bucket] if bucket_covered[bucket] else None,
+                )
+                for bucket in range(buckets)
+            ],
+        }
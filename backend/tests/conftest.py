@@ -0,0 +1,12 @@
+import os
+import sys
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Keep test runs off the default on-disk stores and open to unauthenticated calls.
+os.environ.setdefault("STATUS_HISTORY_DIR", "")
+os.environ.setdefault("AUDIT_LOG_DIR", "")
+os.environ.setdefault("REMOTE_RESULT_DIR", "")
+os.environ.setdefault("REMOTE_AUTH_REQUIRED", "false")
+
+sys.path.insert(0, BACKEND_DIR)
@@ -0,0 +1,25 @@
+from broker_store import BrokerStore
+
+
+def test_empty_report_keeps_unchanged_displays_fresh() -> None:
+    store = BrokerStore("")
+    deltas = [{"key": "10.0.0.1:1515:0", "online": True, "power": "ON", "input": None}]
+    assert store.apply_status_report("agent-1", True, deltas, "2026-01-01T00:00:00+00:00", "2026-01-01T00:00:01+00:00")
+    # Twenty minutes later nothing changed, so the agent sends an empty report.
+    assert store.apply_status_report("agent-1", False, [], "2026-01-01T00:20:00+00:00", "2026-01-01T00:20:01+00:00")
+
+    [device] = store.list_status()
+    assert device["reported_at"] == "2026-01-01T00:20:01+00:00"
+    assert device["observed_at"] == "2026-01-01T00:00:00+00:00"
+
+
+
+def test_status_report_rejects_unparseable_observed_at() -> None:
+    from fastapi.testclient import TestClient
+
+    import main
+
+    client = TestClient(main.app)
+    response = client.post("/api/agent/agent-1/status", json={"full": True, "observed_at": "yesterday"})
+
+    assert response.status_code == 422
@@ -0,0 +1,121 @@
+import os
+import socket
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterator
+
+import pytest
+import requests
+
+from conftest import BACKEND_DIR
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _start_worker(db_path: str) -> tuple[subprocess.Popen, str]:
+    port = _free_port()
+    env = {**os.environ, "APP_MODE": "cloud", "BROKER_DB_PATH": db_path}
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port)],
+        cwd=BACKEND_DIR,
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + 20
+    while time.monotonic() < deadline:
+        try:
+            if requests.get(f"{base_url}/health", timeout=1).ok:
+                return process, base_url
+        except requests.ConnectionError:
+            time.sleep(0.1)
+    process.kill()
+    raise RuntimeError("worker did not start")
+
+
+@pytest.fixture
+def workers(tmp_path) -> Iterator[tuple[str, str]]:
+    # Two separate processes on one database file, as uvicorn --workers 2 would run.
+    db_path = str(tmp_path / "broker.db")
+    started = [_start_worker(db_path) for _ in range(2)]
+    try:
+        yield started[0][1], started[1][1]
+    finally:
+        for process, _base_url in started:
+            process.terminate()
+            process.wait(timeout=10)
+
+
+def test_enqueue_wakes_long_poll_on_other_worker(workers) -> None:
+    worker_a, worker_b = workers
+    requests.post(f"{worker_b}/api/agent/agent-1/heartbeat", json={}, timeout=5).raise_for_status()
+
+    with ThreadPoolExecutor() as pool:
+        started = time.monotonic()
+        poll = pool.submit(
+            requests.post,
+            f"{worker_b}/api/agent/agent-1/poll",
+            json={"wait_seconds": 20},
+            timeout=30,
+        )
+        time.sleep(0.5)
+        enqueued = requests.post(
+            f"{worker_a}/api/remote/jobs",
+            json={"agent_id": "agent-1", "kind": "tv", "payload": {"ip": "10.0.0.1"}},
+            timeout=5,
+        ).json()
+        jobs = poll.result().json()["jobs"]
+        polled_after = time.monotonic() - started
+
+    assert [job["job_id"] for job in jobs] == [enqueued["job_id"]]
+    assert polled_after < 5
+
+    job_id = enqueued["job_id"]
+    with ThreadPoolExecutor() as pool:
+        started = time.monotonic()
+        waiting = pool.submit(requests.get, f"{worker_a}/api/remote/jobs/{job_id}?wait=20", timeout=30)
+        time.sleep(0.5)
+        requests.post(
+            f"{worker_b}/api/agent/agent-1/jobs/{job_id}/result",
+            json={"status": "success", "result": {"ok": True}},
+            timeout=5,
+        ).raise_for_status()
+        job = waiting.result().json()
+        waited = time.monotonic() - started
+
+    assert job["status"] == "completed"
+    assert job["result"] == {"ok": True}
+    assert waited < 5
+
+
+def test_other_agents_work_does_not_wake_long_poll(workers) -> None:
+    worker_a, worker_b = workers
+    for agent_id in ("agent-1", "agent-2"):
+        requests.post(f"{worker_b}/api/agent/{agent_id}/heartbeat", json={}, timeout=5).raise_for_status()
+
+    with ThreadPoolExecutor() as pool:
+        started = time.monotonic()
+        poll = pool.submit(
+            requests.post,
+            f"{worker_b}/api/agent/agent-1/poll",
+            json={"wait_seconds": 2},
+            timeout=30,
+        )
+        time.sleep(0.5)
+        requests.post(
+            f"{worker_a}/api/remote/jobs",
+            json={"agent_id": "agent-2", "kind": "tv", "payload": {"ip": "10.0.0.2"}},
+            timeout=5,
+        ).raise_for_status()
+        jobs = poll.result().json()["jobs"]
+        polled_after = time.monotonic() - started
+
+    assert jobs == []
+    assert polled_after >= 2
@@ -0,0 +1,52 @@
+import asyncio
+
+import mdc_api
+from samsung_mdc import MDC
+
+
+class _FakeMdc:
+    _commands = MDC._commands
+
+    def __init__(self, target: str) -> None:
+        self.is_opened = False
+
+    async def __aenter__(self) -> "_FakeMdc":
+        self.is_opened = True
+        return self
+
+    async def __aexit__(self, *exc_info: object) -> None:
+        self.is_opened = False
+
+    async def close(self) -> None:
+        self.is_opened = False
+
+    async def status(self, display_id: int) -> tuple[str, ...]:
+        return ("ON",)
+
+    async def power(self, display_id: int, args: tuple = ()) -> tuple[str, ...]:
+        return ("ON",)
+
+
+class _Recorder:
+    def __init__(self) -> None:
+        self.entries: list[dict] = []
+
+    def record(self, entry: dict) -> None:
+        self.entries.append(entry)
+
+
+def test_execute_audits_sets_but_not_reads(monkeypatch) -> None:
+    recorder = _Recorder()
+    monkeypatch.setattr(mdc_api, "MDC", _FakeMdc)
+    monkeypatch.setattr(mdc_api, "_audit", recorder)
+
+    async def _run() -> None:
+        await mdc_api.execute_mdc_command(mdc_api.MdcExecuteRequest(ip="10.0.0.7", command="status"))
+        await mdc_api.execute_mdc_command(
+            mdc_api.MdcExecuteRequest(ip="10.0.0.7", command="power", operation="get")
+        )
+        await mdc_api.execute_mdc_command(mdc_api.MdcExecuteRequest(ip="10.0.0.7", command="power", args=["ON"]))
+
+    asyncio.run(_run())
+
+    assert [(entry["command"], entry["detail"]["operation"]) for entry in recorder.entries] == [("power", "set")]
@@ -0,0 +1,85 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+import mdc_api
+from samsung_mdc import MDC
+
+
+class _FakeMdc:
+    # Counts open sessions per ip:port; the first session's status reply fails.
+    _commands = MDC._commands
+    fail_delay = 0.1
+    open_sessions: dict[str, int] = {}
+    max_open: dict[str, int] = {}
+    opened = 0
+
+    def __init__(self, target: str) -> None:
+        self.target = target
+        self.is_opened = False
+
+    async def __aenter__(self) -> "_FakeMdc":
+        cls = type(self)
+        cls.open_sessions[self.target] = cls.open_sessions.get(self.target, 0) + 1
+        cls.max_open[self.target] = max(cls.max_open.get(self.target, 0), cls.open_sessions[self.target])
+        cls.opened += 1
+        self.session = cls.opened
+        self.is_opened = True
+        return self
+
+    async def __aexit__(self, *exc_info: object) -> None:
+        type(self).open_sessions[self.target] -= 1
+        self.is_opened = False
+
+    async def close(self) -> None:
+        self.is_opened = False
+
+    async def status(self, display_id: int) -> tuple[str, ...]:
+        if self.session == 1:
+            await asyncio.sleep(self.fail_delay)
+            raise ConnectionResetError("display dropped the session")
+        await asyncio.sleep(0.01)
+        return ("ON",)
+
+
+def _fake_mdc(fail_delay: float) -> type[_FakeMdc]:
+    return type("_FakeMdc", (_FakeMdc,), {"fail_delay": fail_delay, "open_sessions": {}, "max_open": {}, "opened": 0})
+
+
+def test_retried_gets_never_overlap_sessions_on_one_channel(monkeypatch) -> None:
+    fake = _fake_mdc(fail_delay=0.1)
+    monkeypatch.setattr(mdc_api, "MDC", fake)
+    monkeypatch.setattr(mdc_api, "MDC_GET_RETRY_ENABLED", True)
+
+    async def _run() -> list[dict]:
+        return await asyncio.gather(
+            mdc_api.test_tv_connection("10.0.0.9", display_id=1, tier="deep"),
+            mdc_api.test_tv_connection("10.0.0.9", display_id=2, tier="deep"),
+        )
+
+    results = asyncio.run(_run())
+
+    assert [result["reachable"] for result in results] == [True, True]
+    assert fake.max_open == {"10.0.0.9:1515": 1}
+    # One failed first attempt, its retry, and the other GET's only attempt.
+    assert fake.opened == 3
+
+
+@pytest.mark.parametrize("enabled", [True, False])
+def test_fast_failing_get_succeeds_only_with_retry(monkeypatch, enabled: bool) -> None:
+    fake = _fake_mdc(fail_delay=0)
+    monkeypatch.setattr(mdc_api, "MDC", fake)
+    monkeypatch.setattr(mdc_api, "MDC_GET_RETRY_ENABLED", enabled)
+
+    async def _run() -> dict:
+        return await mdc_api.test_tv_connection("10.0.0.10", display_id=1, tier="deep")
+
+    if enabled:
+        assert asyncio.run(_run())["reachable"] is True
+        assert fake.opened == 2
+    else:
+        with pytest.raises(HTTPException) as excinfo:
+            asyncio.run(_run())
+        assert excinfo.value.status_code == 502
+        assert fake.opened == 1